@@ -16,9 +16,29 @@ File:    solarview.py
          password=YourPassword
          pickle_dir="./"
          pickle_template="solarviewdata_????.pkl"
+         tile_dir="./tiles"              (optional)
 
          Dependencies:
          requests
+         pyarrow (optional, only to export to parquet or arrow)
+         openpyxl (optional, only to import xlsx-files)
+         numpy (optional, only to scan for anomalies)
+         
+         Command line:
+         solarview.py                          shows the heatmap of this year
+         solarview.py poster poster.png --years 2018-
+                                               renders all years side by side
+         solarview.py print 2019 print.png --dpi 300
+                                               renders a year for print
+         solarview.py export samples.csv --start 2019-01-01 --end 2019-06-30
+                                               exports the stored data
+         solarview.py import history2018.csv   imports a Growatt portal export
+         solarview.py collect --interval 15    downloads every 15 minutes
+         solarview.py --viewer                 shows the heatmap, does not download
+         solarview.py serve --port 8080        serves /year/2019.png and /live.png
+         solarview.py scan --report report.json
+                                               finds outages and anomalies
+         solarview.py --profile trace.json     writes the duration of each phase
          
          Uses:
          GrowattApi: https://github.com/Sjord/growatt_api_client
@@ -29,6 +49,21 @@ Date:    2018-06-09
 Author:  Jan Knoop, Ruud van der Ham
 
 Version    Date        Change
+   0.37    2026-10-18  Profiling of the phases into a trace file, optionally with cProfile
+   0.36    2026-10-18  Tooltip with date, time and power of the pixel under the mouse
+   0.35    2026-10-18  Scans for outages and anomalies, optionally marked on the heatmap
+   0.34    2026-10-18  Serves the heatmaps over http with ETag / Last-Modified
+   0.33    2026-10-18  Collector without gui, gui as viewer only
+                       Datafiles written atomically under a lock, reloaded when changed
+   0.32    2026-10-18  Imports history exported from the Growatt web portal
+                       Errors printed when running without gui
+   0.31    2026-10-18  Export to csv, parquet or arrow
+                       Format pickle-file changed: plant id and name added
+   0.30    2026-10-18  Projection scales with scale factor, print at high resolution
+   0.29    2026-10-18  Timeline of all years with zoom, drawn from cached tiles
+   0.28    2026-10-18  Multi-year poster, rendered year by year into a streamed png
+                       Drawing moved from SolarviewApp to YearHeatmap
+                       Command line interface
    0.27    2020-03-13  Introduces pathlib, object g to avoid globals
                        Imports changed
                        Removed os, glob
@@ -68,12 +103,22 @@ Version    Date        Change
 import tkinter as tk
 from tkinter import ttk, filedialog, simpledialog
 
+import argparse
+import sys
+
 import datetime as dt
 from PIL import Image, ImageDraw, ImageFont, ImageTk
 import calendar
 
 import pickle
 import bz2
+import zlib
+import struct
+import tempfile
+import math
+import queue
+import concurrent.futures
+import multiprocessing
 from pathlib import Path
 
 from enum import IntEnum
@@ -81,12 +126,168 @@ import hashlib
 import requests
 
 import configparser
+import cProfile
+import contextlib
+import collections
+import functools
+import csv
+import json
+import warnings
+import time
+import io
+import re
+import threading
+import email.utils
+import http.client
+import http.server
+import urllib.parse
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
 debug = False
 
 
 class g:
     inifilename = "solarview.ini"
+    gui = False  # errors are shown in a messagebox, else printed
+
+
+class Profiler:
+    """
+    Times the phases of loading, downloading, saving and drawing.
+    The trace is written as Chrome trace events (json), to be read by chrome://tracing,
+    Perfetto or speedscope; nested phases show as a flame graph.
+    With cprofile, every outermost phase is also profiled into a .prof-file (pstats, snakeviz).
+    Off unless started: phase() then returns a shared do-nothing context.
+    Worker processes are started with startworker(); their events are passed back with
+    the result and added with merge(), cprofile is not done in workers.
+    Only the last maxevents events are kept, and the file is rewritten every flushinterval
+    seconds, so serve and collect can run with a trace.
+    """
+
+    maxevents = 100000
+    flushinterval = 60  # seconds
+
+    def __init__(self):
+        self.enabled = False
+        self.filename = None
+        self.cprofile = False
+        self.cprofiling = False
+        self.events = collections.deque(maxlen=self.maxevents)
+        self.nprofiles = 0
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.written = self.origin
+        self.nophase = contextlib.nullcontext()
+
+    def start(self, filename, cprofile=False):
+        self.filename = Path(filename)
+        self.filename.parent.mkdir(parents=True, exist_ok=True)
+        self.cprofile = cprofile
+        self.events.clear()
+        self.origin = time.perf_counter()
+        self.written = self.origin
+        self.enabled = True
+
+    def startworker(self, origin):
+        """
+        Profile in a worker process, with the origin of the main process (perf_counter is system-wide).
+        No file is written, the events are collected with takeevents()
+        """
+        self.filename = None
+        self.cprofile = False
+        self.events.clear()
+        self.origin = origin
+        self.enabled = True
+
+    def workerorigin(self):
+        """ Argument for a worker process: None when not profiling """
+        return self.origin if self.enabled else None
+
+    def takeevents(self):
+        with self.lock:
+            events = list(self.events)
+            self.events.clear()
+        return events
+
+    def merge(self, events):
+        with self.lock:
+            self.events.extend(events)
+
+    def phase(self, name, **args):
+        if not self.enabled:
+            return self.nophase
+        return self.timedphase(name, args)
+
+    @contextlib.contextmanager
+    def timedphase(self, name, args):
+        profile = None
+        if self.cprofile and not self.cprofiling:
+            profile = cProfile.Profile()
+            self.cprofiling = True
+            profile.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            event = {
+                "name": name,
+                "ph": "X",
+                "ts": (start - self.origin) * 1e6,  # microseconds
+                "dur": (end - start) * 1e6,
+                "pid": multiprocessing.current_process().pid,
+                "tid": threading.get_ident(),
+            }
+            if args:
+                event["args"] = args
+            if profile is not None:
+                profile.disable()
+                self.cprofiling = False
+                self.nprofiles += 1
+                proffilename = self.filename.with_name(
+                    "{}.{}.{}.prof".format(self.filename.stem, self.nprofiles, name.replace(" ", "_"))
+                )
+                profile.dump_stats(str(proffilename))
+                event.setdefault("args", {})["cprofile"] = proffilename.name
+            with self.lock:
+                self.events.append(event)
+            if self.filename is not None and end - self.written > self.flushinterval:
+                self.write()
+
+    def timed(self, name):
+        """
+        Decorator: the function is a phase
+        """
+
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with self.phase(name):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def write(self):
+        if self.enabled and self.filename is not None:
+            self.written = time.perf_counter()
+            with self.lock:
+                events = list(self.events)
+            tmpfilename = self.filename.with_suffix(".tmp")
+            with open(tmpfilename, "w") as f:
+                json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+            tmpfilename.replace(self.filename)
+
+
+profiler = Profiler()
 
 
 """
@@ -134,6 +335,7 @@ class LoginError(GrowattApiError):
 
 class GrowattApi:
     server_url = "https://server.growatt.com/"
+    timeout = 30  # seconds, so a stalled connection does not hang the collector
 
     def __init__(self):
         self.session = requests.Session()
@@ -154,7 +356,9 @@ class GrowattApi:
         Log in to the Growatt server, or raise an exception if this fails.
         """
         password_md5 = hash_password(password)
-        response = self.session.post(self.get_url("LoginAPI.do"), data={"userName": username, "password": password_md5})
+        response = self.session.post(
+            self.get_url("LoginAPI.do"), data={"userName": username, "password": password_md5}, timeout=self.timeout
+        )
         try:
             result = self._back_success_response(response)
             self.logged_in = True
@@ -166,7 +370,7 @@ class GrowattApi:
         """
         Retrieve all plants belonging to the current user.
         """
-        response = self.session.get(self.get_url("PlantListAPI.do"), allow_redirects=False)
+        response = self.session.get(self.get_url("PlantListAPI.do"), allow_redirects=False, timeout=self.timeout)
         return self._back_success_response(response)
 
     def plant_detail(self, plant_id, timespan, date):
@@ -181,7 +385,9 @@ class GrowattApi:
         date_str = timespan.format_date(date)
 
         response = self.session.get(
-            self.get_url("PlantDetailAPI.do"), params={"plantId": plant_id, "type": timespan.value, "date": date_str}
+            self.get_url("PlantDetailAPI.do"),
+            params={"plantId": plant_id, "type": timespan.value, "date": date_str},
+            timeout=self.timeout,
         )
         return self._back_success_response(response)
 
@@ -197,7 +403,9 @@ class GrowattApi:
         date_str = timespan.format_date(date)
 
         response = self.session.get(
-            self.get_url("newPlantDetailAPI.do"), params={"plantId": plant_id, "type": timespan.value, "date": date_str}
+            self.get_url("newPlantDetailAPI.do"),
+            params={"plantId": plant_id, "type": timespan.value, "date": date_str},
+            timeout=self.timeout,
         )
         return self._back_success_response(response)
 
@@ -208,12 +416,15 @@ class GrowattApi:
         * todayValue - power generated today
         """
         response = self.session.post(
-            self.get_url("newPlantAPI.do"), params={"action": "getUserCenterEnertyData"}, data={"language": 1}  # sic
+            self.get_url("newPlantAPI.do"),
+            params={"action": "getUserCenterEnertyData"},  # sic
+            data={"language": 1},
+            timeout=self.timeout,
         )
         return response.json()
 
     def logout(self):
-        self.session.get(self.get_url("logout.do"))
+        self.session.get(self.get_url("logout.do"), timeout=self.timeout)
         self.logged_in = False
 
     def _back_success_response(self, response):
@@ -284,6 +495,96 @@ def daterange(start_date, end_date):
         yield start_date + dt.timedelta(n)
 
 
+"""
+read username, password and location of the datafiles
+"""
+
+
+@profiler.timed("readinifile")
+def readinifile():
+    config = configparser.ConfigParser()
+    if not Path(g.inifilename).exists():
+        raise FileNotFoundError(g.inifilename + " not found")
+
+    config.read(g.inifilename)
+
+    g.username = config["ini"]["username"].strip("\"'")
+    g.password = config["ini"]["password"].strip("\"'")
+    g.pickle_dir = Path(config["ini"]["pickle_dir"].strip("\"'"))
+    g.pickle_template = config["ini"]["pickle_template"].strip("\"'")
+    g.tile_dir = Path(config["ini"].get("tile_dir", str(g.pickle_dir / "tiles")).strip("\"'"))
+
+    if debug:
+        print(g.username, g.password, g.pickle_dir, g.pickle_template)
+
+
+"""
+show an error in a messagebox, or on stderr when running without gui
+"""
+
+
+def showerror(title, message):
+    if g.gui:
+        tk.messagebox.showinfo(title, message)
+    else:
+        print("{}: {}".format(title, message), file=sys.stderr)
+
+
+"""
+name of the local datafile of a year
+"""
+
+
+def picklefilename(year):
+    return Path(str(g.pickle_dir / g.pickle_template).replace("????", str(year)))
+
+
+"""
+stamp of the local datafile of a year, changes when the file is written
+"""
+
+
+def datastamp(year):
+    filename = picklefilename(year)
+    if filename.exists():
+        stat = filename.stat()
+        return "{}-{}".format(stat.st_mtime_ns, stat.st_size)
+    return "none"
+
+
+class StoreLock:
+    """
+    Lock on the local datafiles, taken by all processes writing them (gui, collector, import).
+    Readers do not need it, as a datafile is written to a temporary file that replaces it.
+    """
+
+    def __init__(self):
+        self.filename = g.pickle_dir / "solarview.lock"
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.filename, "a+b")
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        else:
+            self.file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK gives up after 10 seconds
+                    pass
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        else:
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        self.file.close()
+
+
 class ShinePhoneDayData:
     def __init__(self, datestr, todayenergy):
         self.datestr = datestr
@@ -297,9 +598,13 @@ class GrowattServerData:
     - first check if local pickle file is present
     - if not or file not complete try to read from servers using ShinePhoneApi
       using Growatt api from Sjord
+    - with download=False only the local pickle file is used
     """
 
-    def __init__(self, year=None, setprogress=None):
+    unknown_plant_id = "plant_id"  # until read from the server (files before 0.31, imports)
+    unknown_plant_name = "plant_name"
+
+    def __init__(self, year=None, setprogress=None, download=True):
         self.setprogress = setprogress
 
         self.yearsavailableonserver = {}
@@ -309,6 +614,9 @@ class GrowattServerData:
         self.days = {}  # dict of ShinePhoneDayData()
 
         self.year_complete = False
+        self.yearproduction = 0.0
+        self.plant_id = self.unknown_plant_id
+        self.plant_name = self.unknown_plant_name
 
         if year is None:
             self.year = now.year  #
@@ -321,9 +629,6 @@ class GrowattServerData:
                 end_date = dt.datetime(self.year, 12, 31)
 
         if self.load_from_picklefile(self.year):
-            self.plant_id = "plant_id"
-            self.plant_name = "plant_name"
-
             """ determine which days to read """
             if len(self.days) > 0:
                 start_date = dt.datetime.strptime(max(self.days.keys()), "%Y-%m-%d")  # string
@@ -337,7 +642,7 @@ class GrowattServerData:
         else:
             start_date = dt.datetime(year, 1, 1)
 
-        if not self.year_complete:
+        if download and not self.year_complete:
             if self.downloadgrowattdata(start_date, end_date):
                 if start_date.year < now.year:
                     self.year_complete = True
@@ -349,116 +654,127 @@ class GrowattServerData:
                 self.yearsavailable.append(year)
         self.yearsavailable.sort()
 
-    def downloadgrowattdata(self, start_date, end_date):
+    @profiler.timed("downloadgrowattdata")
+    def downloadgrowattdata(self, start_date, end_date, dates=None):
+        """
+        Download the days from start_date to end_date, or only the given dates in that range
+        """
         if debug:
             print("downloadgrowattdata: {} {}".format(start_date, end_date))
+        if dates is None:
+            dates = list(daterange(start_date, end_date))
 
         try:
             with GrowattApi() as gwa:
 
-                gwa.login(g.username, g.password)
-                self.plant_info = gwa.plant_list()
-                if debug:
-                    print("**plant_info**", self.plant_info)
-                self.plant_id = self.plant_info["data"][0]["plantId"]
-                self.plant_name = ""
-
-                """ determine for which years serverdata are available """
-                plant_detail = gwa.new_plant_detail(self.plant_id, Timespan.total, None)
-                if debug:
-                    print("**plant_detail**", plant_detail)
-                self.yearsavailableonserver = {
-                    int(y): float(plant_detail["data"][y])
-                    for y in plant_detail["data"]
-                    if float(plant_detail["data"][y]) > 0
-                }
-
-                if debug:
-                    print("yearsavailable on server", self.yearsavailableonserver)
-
-                if start_date.year in self.yearsavailableonserver:
-                    self.yearproduction = self.yearsavailableonserver[start_date.year]
-                else:
-                    self.yearproduction = 0.0
-
-                """ prepare to show progress  """
-                nr_of_days = (end_date - start_date).days + 1
-                daycount = 0
-                for d in daterange(start_date, end_date):
-                    if self.setprogress is not None:
-                        daycount += 1
-                        self.setprogress(int(100 * daycount / nr_of_days))
-
-                    plant_detail = gwa.new_plant_detail(self.plant_id, Timespan.day, d)
+                with profiler.phase("login"):
+                    gwa.login(g.username, g.password)
+                with profiler.phase("metadata"):
+                    self.plant_info = gwa.plant_list()
                     if debug:
-                        print("**plant_detail**", plant_detail)
-                    plantdata = plant_detail["plantData"]
-                    if self.plant_name != plantdata["plantName"]:
-                        self.plant_name = plantdata["plantName"]
-
-                    datestr = d.strftime("%Y-%m-%d")
-                    if datestr not in self.days:
-                        self.days[datestr] = ShinePhoneDayData(datestr=datestr, todayenergy=0)
-
-                    data = plant_detail["data"]
-                    for datetimestampstr in data:
-                        timestampstr = datetimestampstr.split(" ")[1]  # only time
-                        actualpower = float(data[datetimestampstr])
-                        self.days[datestr].samples[timestampstr] = actualpower
-
-                    #                    self.days[datestr].samples.sort(key=lambda x: x.timestampstr)
+                        print("**plant_info**", self.plant_info)
+                    self.plant_id = self.plant_info["data"][0]["plantId"]
+                    self.plant_name = ""
 
+                    """ determine for which years serverdata are available """
+                    plant_detail = gwa.new_plant_detail(self.plant_id, Timespan.total, None)
                     if debug:
-                        for ts in sorted(self.days[datestr].samples):
-                            print(ts, self.days[datestr].samples[ts])
-
-                """
-                Read daily production (by reading monthly data)
-                """
-                months = []
-                for d in daterange(start_date, end_date):
-                    if not ((d.year, d.month) in months):
-                        months.append((d.year, d.month))
-                if debug:
-                    print("months", months)
-
-                for m in months:
-                    monthstr = "{:4}-{:02}-".format(m[0], m[1])
-                    firstday = dt.datetime(int(m[0]), int(m[1]), 1)
-                    plantdetail_month = gwa.new_plant_detail(self.plant_id, Timespan.month, firstday)
-                    if debug:
-                        print(plantdetail_month)
-                    monthdata = plantdetail_month["data"]
-                    if debug:
-                        print("monthdata", monthdata)
-
-                    for day in monthdata.keys():
-                        etoday = float(monthdata[day])
-                        datestr = monthstr + day
+                        print("**plant_detail**", plant_detail)
+                    self.yearsavailableonserver = {
+                        int(y): float(plant_detail["data"][y])
+                        for y in plant_detail["data"]
+                        if float(plant_detail["data"][y]) > 0
+                    }
 
-                        if not (datestr in self.days):
+                    if debug:
+                        print("yearsavailable on server", self.yearsavailableonserver)
+
+                    if start_date.year in self.yearsavailableonserver:
+                        self.yearproduction = self.yearsavailableonserver[start_date.year]
+                    else:
+                        self.yearproduction = 0.0
+
+                with profiler.phase("day loop", days=len(dates)):
+                    """ prepare to show progress  """
+                    nr_of_days = len(dates)
+                    daycount = 0
+                    for d in dates:
+                        if self.setprogress is not None:
+                            daycount += 1
+                            self.setprogress(int(100 * daycount / nr_of_days))
+
+                        plant_detail = gwa.new_plant_detail(self.plant_id, Timespan.day, d)
+                        if debug:
+                            print("**plant_detail**", plant_detail)
+                        plantdata = plant_detail["plantData"]
+                        if self.plant_name != plantdata["plantName"]:
+                            self.plant_name = plantdata["plantName"]
+
+                        datestr = d.strftime("%Y-%m-%d")
+                        if datestr not in self.days:
                             self.days[datestr] = ShinePhoneDayData(datestr=datestr, todayenergy=0)
-                        self.days[datestr].todayenergy = etoday
+
+                        data = plant_detail["data"]
+                        for datetimestampstr in data:
+                            timestampstr = datetimestampstr.split(" ")[1]  # only time
+                            actualpower = float(data[datetimestampstr])
+                            self.days[datestr].samples[timestampstr] = actualpower
+
+                        #                    self.days[datestr].samples.sort(key=lambda x: x.timestampstr)
+
+                        if debug:
+                            for ts in sorted(self.days[datestr].samples):
+                                print(ts, self.days[datestr].samples[ts])
+
+                with profiler.phase("month loop"):
+                    """
+                    Read daily production (by reading monthly data)
+                    """
+                    months = []
+                    for d in dates:
+                        if not ((d.year, d.month) in months):
+                            months.append((d.year, d.month))
+                    if debug:
+                        print("months", months)
+
+                    for m in months:
+                        monthstr = "{:4}-{:02}-".format(m[0], m[1])
+                        firstday = dt.datetime(int(m[0]), int(m[1]), 1)
+                        plantdetail_month = gwa.new_plant_detail(self.plant_id, Timespan.month, firstday)
+                        if debug:
+                            print(plantdetail_month)
+                        monthdata = plantdetail_month["data"]
+                        if debug:
+                            print("monthdata", monthdata)
+
+                        for day in monthdata.keys():
+                            etoday = float(monthdata[day])
+                            datestr = monthstr + day
+
+                            if not (datestr in self.days):
+                                self.days[datestr] = ShinePhoneDayData(datestr=datestr, todayenergy=0)
+                            self.days[datestr].todayenergy = etoday
 
             result = True
 
         except GrowattApiError:
-            tk.messagebox.showinfo("Connection Error", "No connection to Growatt servers")
+            showerror("Connection Error", "No connection to Growatt servers")
             result = False
 
-        except requests.exceptions.ConnectionError:
-            tk.messagebox.showinfo("Connection Error", "No connection to Growatt servers")
+        except requests.exceptions.RequestException:  # no connection, timeout
+            showerror("Connection Error", "No connection to Growatt servers")
             result = False
 
         except LoginError:
-            tk.messagebox.showinfo("Login Error", "Username / password not correct")
+            showerror("Login Error", "Username / password not correct")
             result = False
 
         return result  # True means data has been received from server
 
     """  Determine years available in local datafiles """
 
-    def yearsavailablelocally(self):
+    @staticmethod
+    def yearsavailablelocally():
         files = g.pickle_dir.glob(g.pickle_template)
         years = []
         for f in files:
@@ -470,38 +786,66 @@ class GrowattServerData:
                 pass
         return years
 
+    @profiler.timed("dump_to_picklefile")
     def dump_to_picklefile(self, year):
-        filename = Path(str(g.pickle_dir / g.pickle_template).replace("????", str(year)))
-        with bz2.open(filename, "wb") as f:
-            pickle.dump((self.year_complete, self.yearproduction, self.days), f)
+        """
+        Write the datafile under the StoreLock, via a temporary file so readers never see a partial file.
+        Days written in the meantime by another process and not present here are kept.
+        """
+        filename = picklefilename(year)
+        tmpfilename = filename.with_suffix(".tmp")
+        with StoreLock():
+            if filename.exists():
+                with bz2.open(filename, "rb") as f:
+                    data = pickle.load(f)
+                for datestr, day in data[2].items():
+                    if datestr not in self.days:
+                        self.days[datestr] = day
+                self.year_complete = self.year_complete or data[0]
+            with bz2.open(tmpfilename, "wb") as f:
+                pickle.dump((self.year_complete, self.yearproduction, self.days, self.plant_id, self.plant_name), f)
+            tmpfilename.replace(filename)
         return True
 
+    @profiler.timed("load_from_picklefile")
     def load_from_picklefile(self, year):
-        filename = Path(str(g.pickle_dir / g.pickle_template).replace("????", str(year)))
+        filename = picklefilename(year)
         if filename.exists():
-            with bz2.open(filename, "rb") as f:
-                self.year_complete, self.yearproduction, self.days = pickle.load(f)
+            with bz2.open(filename, "rb") as f:  # no lock: datafiles are replaced at once
+                data = pickle.load(f)
+            self.year_complete, self.yearproduction, self.days = data[:3]
+            if len(data) > 3:  # plant stored since 0.31
+                self.plant_id, self.plant_name = data[3:5]
             return True
         else:
             return False
 
 
 class Projection:
-    def __init__(self):
-        self.height = 800
-        self.topmargin = 50
-        self.bottommargin = 50
-        self.leftmargin = 50
-        self.rightmargin = 50
-        self.linewidth = 2
-        self.pixels_per_day = self.linewidth + 1
-        self.width = (self.linewidth + 1) * 365 + self.leftmargin + self.rightmargin
-
-        self.pixels_per_kwh = 6
-        self.pixels_per_hour = 30
+    """
+    Dimensions of the heatmap of a year.
+    All dimensions and font sizes follow scale, e.g. scale=4 for print.
+    """
+
+    def __init__(self, scale=1.0):
+        self.scale = scale
+        self.height = int(round(800 * scale))
+        self.topmargin = int(round(50 * scale))
+        self.bottommargin = int(round(50 * scale))
+        self.leftmargin = int(round(50 * scale))
+        self.rightmargin = int(round(50 * scale))
+        self.linewidth = max(1, int(round(2 * scale)))
+        self.pixels_per_day = self.linewidth + max(1, int(round(scale)))
+        self.width = self.pixels_per_day * 365 + self.leftmargin + self.rightmargin
+
+        self.pixels_per_kwh = 6 * scale
+        self.pixels_per_hour = 30 * scale
 
         self.fiveoclockbase = self.height - self.bottommargin - 35 * self.pixels_per_kwh
 
+        self.fontsize = int(round(10 * scale))
+        self.fontsizebig = int(round(18 * scale))
+
         self.power_to_color_table = (
             (0, "#C0C0C0"),  # gray75
             (500, "#87CEFA"),  # light sky blue
@@ -512,6 +856,17 @@ class Projection:
             (float("inf"), "#B00000"),  # dark red
         )
 
+        self.anomaly_colors = {
+            "missing": "#000000",
+            "flatline": "#800080",  # purple
+            "truncated": "#FF00FF",  # magenta
+            "low": "#808080",
+        }
+
+    def s(self, pixels):
+        """ scale a distance in pixels at scale 1 """
+        return pixels * self.scale
+
     def power_to_color(self, power):
         for (upperbound, color) in self.power_to_color_table:
             if power <= upperbound:
@@ -531,187 +886,35 @@ class Projection:
         return result
 
 
-class YearSelector(simpledialog.Dialog):
-    def __init__(self, parent, years):
-        """ Init progress window """
-        self.parent = parent
-        tk.Toplevel.__init__(self, master=parent)
-        self.year = 0
-
-        """ Create progress window """
-        self.focus_set()  # set focus on the ProgressWindow
-        self.grab_set()  # make a modal window, so all events go to the ProgressWindow
-        self.transient(self.master)  # show only one window in the task bar
-        #
-        self.title("Select year to plot")
-        self.resizable(False, False)  # window is not resizable
-        # self.close gets fired when the window is destroyed
-        self.protocol("WM_DELETE_WINDOW", self.close)
-        # Set proper position over the parent window
-        self.geometry("200x200+100+100")
-        self.bind("<Escape>", self.close)  # cancel progress when <Escape> key is pressed
-
-        self.lbx = tk.Listbox(self)
-        self.rowconfigure(0, weight=1)
-        self.columnconfigure(0, weight=1)
-        self.lbx.grid(row=0, column=0, sticky=tk.NSEW)
-        self.lbx.bind("<Double-Button-1>", self.lbxdoubleclick)
-        self.sb1 = tk.Scrollbar(self, orient=tk.VERTICAL)
-        self.sb1.grid(row=0, column=1, sticky=tk.NS + tk.E)
-        self.sb1.config(command=self.yview)
-        self.lbx.configure(yscrollcommand=self.sb1.set)
-
-        for item in years:
-            self.lbx.insert(tk.END, item)
-
-    def yview(self, *args):
-        self.lbx.yview(*args)
-
-    def lbxdoubleclick(self, event):
-        self.lbxlineselected()
-
-    def lbxlineselected(self):
-        selection = self.lbx.curselection()
-        if len(selection) > 0:
-            self.year = int(self.lbx.get(selection[0]))  # take first line
-            self.close()
-
-    def show(self):
-        self.wait_window()
-        return self.year
-
-    def close(self, event=None):
-        """ Close progress window """
-        self.parent.focus_set()  # put focus back to the parent window
-        self.destroy()  # destroy progress window
-
-
-class ProgressWindow(simpledialog.Dialog):
-    def __init__(self, parent, text):
-        """ Init progress window """
-        tk.Toplevel.__init__(self, master=parent)
-        self.parent = parent
-        self.text = text
-        self.length = 300
-
-        self.maximum = 100
-
-        self.focus_set()  # set focus on the ProgressWindow
-
-        self.wait_visibility()
-        self.grab_set()  # make a modal window, so all events go to the ProgressWindow
-        self.transient(self.master)  # show only one window in the task bar
-        #
-        self.title("Downloading data for {}".format(self.text))
-        self.resizable(False, False)  # window is not resizable
-        # self.close gets fired when the window is destroyed
-        self.protocol("WM_DELETE_WINDOW", self.close)
-        # Set proper position over the parent window
-        self.geometry("300x30+100+100")
-
-        self.num = tk.IntVar()
-
-        self.rowconfigure(0, weight=1)
-        self.columnconfigure(0, weight=1)
-        self.pgb = ttk.Progressbar(
-            self, maximum=self.maximum, orient="horizontal", length=self.length, variable=self.num, mode="determinate"
-        )
-        self.pgb.grid(row=0, column=0, sticky=tk.NSEW)
-
-        self.num.set(0)
-
-    def set(self, value):
-        self.num.set(value)
-        self.pgb.update()
-
-    def close(self, event=None):
-        """ Close progress window """
-        self.master.focus_set()  # put focus back to the parent window
-        self.destroy()  # destroy progress window
-
-
-class SolarviewApp:
-    def __init__(self, parent):
-
-        self.parent = parent
-        self.parent.title("Solarview - Growatt server annual overview")
-        self.readinifile()
-
-        self.createmenubar(self.parent)
-
-        self.prj = Projection()
-
-        self.canvas = tk.Canvas(
-            self.parent,
-            scrollregion=(0, 0, self.prj.width, self.prj.height),
-            width=self.prj.width,  # Ruud: make it not too large
-            height=self.prj.height,  # Ruud: make it not too large
-            bg="white",
-            bd=0,
-            highlightthickness=0,
-        )
-
-        self.canvas.grid(row=0, column=0)
-
-        self.make_scrollbars()
-        self.canvas.update()
-
-        self.year = dt.datetime.now().year
-
-        self.pgw = ProgressWindow(None, str(self.year))
-        self.gsd = GrowattServerData(self.year, setprogress=self.pgw.set)
-        self.pgw.close()
-
-        self.create_image_pil()
-        self.imagetk = ImageTk.PhotoImage(self.image)
-        self.canvas.create_image(0, 0, image=self.imagetk, anchor=tk.NW)
-
-        self.canvas.update()
-
-    def readinifile(self):
-        config = configparser.ConfigParser()
-        if not Path(g.inifilename).exists():
-            raise FileNotFoundError(g.inifilename + " not found")
-
-        config.read(g.inifilename)
-
-        g.username = config["ini"]["username"].strip("\"'")
-        g.password = config["ini"]["password"].strip("\"'")
-        g.pickle_dir = Path(config["ini"]["pickle_dir"].strip("\"'"))
-        g.pickle_template = config["ini"]["pickle_template"].strip("\"'")
+"""
+width and height of a text in a font (ImageDraw.textsize was removed in Pillow 10)
+"""
 
-        if debug:
-            print(g.username, g.password, g.pickle_dir, g.pickle_template)
 
-    def make_scrollbars(self):
-        sy = tk.Scrollbar(orient=tk.VERTICAL, command=self.canvas.yview)
-        sy.grid(row=0, column=1, sticky=tk.NS)
-        self.canvas.configure(yscrollcommand=sy.set)
+def textsize(draw, text, font):
+    left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
+    return right - left, bottom - top
 
-        sx = tk.Scrollbar(orient=tk.HORIZONTAL, command=self.canvas.xview)
-        sx.grid(row=1, column=0, sticky=tk.EW)
-        self.canvas.configure(xscrollcommand=sx.set)
 
-        top = self.canvas.winfo_toplevel()
-        top.rowconfigure(0, weight=1)
-        top.columnconfigure(0, weight=1)
-        self.canvas.grid(row=0, column=0, sticky=tk.NSEW)
+class YearHeatmap:
+    """
+    Draws the heatmap of one year (GrowattServerData) in a PIL image,
+    using the dimensions of a Projection
+    """
 
-    def createmenubar(self, root):
-        menubar = tk.Menu(root)
-        filemenu = tk.Menu(menubar, tearoff=0)
-        filemenu.add_command(label="Select year", command=self.select_year)
-        filemenu.add_command(label="Save image", command=self.save_image)
-        filemenu.add_separator()
-        filemenu.add_command(label="Exit", command=root.destroy)
-        menubar.add_cascade(label="File", menu=filemenu)
-        root.config(menu=menubar)
+    def __init__(self, gsd, prj, anomalies=None):
+        self.gsd = gsd
+        self.prj = prj
+        self.anomalies = anomalies  # {datestr: kind} from scan_anomalies, marked above the heatmap
+        self.image = None
 
+    @profiler.timed("draw_grid_pil")
     def draw_grid_pil(self, draw, font, fontbig):
         """
         draw the grid lines
         """
-        y_high = self.prj.topmargin - 20
+        s = self.prj.s
+        y_high = self.prj.topmargin - s(20)
         y_low = self.prj.height - self.prj.bottommargin
         for m in range(1, 14):
             """ determine x-coord of 1st of month """
@@ -721,12 +924,12 @@ class SolarviewApp:
                 day_diff = isodate_diff("{:4}-01-01".format(self.gsd.year + 1), "{:4}-01-01".format(self.gsd.year))
 
             x = self.prj.leftmargin + day_diff * (self.prj.pixels_per_day) - (self.prj.pixels_per_day / 2)
-            draw.line([(x, y_high), (x, y_low)], fill=0, width=1)
+            draw.line([(x, y_high), (x, y_low)], fill=0, width=max(1, int(s(1))))
 
             if m < 13:  # draw month name
                 text = calendar.month_name[m]
-                bd, hg = draw.textsize(text)
-                draw.text((x + 15 * (self.prj.linewidth + 1) - bd / 2, y_low + hg / 2), text=text, fill=0, font=font)
+                bd, hg = textsize(draw, text, font)
+                draw.text((x + 15 * self.prj.pixels_per_day - bd / 2, y_low + hg / 2), text=text, fill=0, font=font)
 
         """ draw hour lines """
         x_min = self.prj.leftmargin
@@ -736,23 +939,24 @@ class SolarviewApp:
         """ for 5:00 to 22:00 """
         for h in range(5, 23):
             y = self.prj.fiveoclockbase - (h - 5) * self.prj.pixels_per_hour
-            draw.line((x_min, y, x_max, y), fill=(196, 196, 196), width=1)
+            draw.line((x_min, y, x_max, y), fill=(196, 196, 196), width=max(1, int(s(1))))
             text = "{:1}:00".format(h)
-            bd, hg = draw.textsize(text)
+            bd, hg = textsize(draw, text, font)
             draw.text((x_min - bd, y - hg / 2), text=text, fill=(128, 128, 128), font=font)
 
         """ draw kWh- lines  0 .. 25 """
         for p in range(0, 26, 5):
             y_pos = y_max - p * self.prj.pixels_per_kwh
-            draw.line([x_min, y_pos, x_max, y_pos], fill=(196, 196, 196), width=1)
+            draw.line([x_min, y_pos, x_max, y_pos], fill=(196, 196, 196), width=max(1, int(s(1))))
             text = "{:1}".format(p)
-            bd, hg = draw.textsize(text)
-            draw.text((x_min - 10 - bd / 2, y_pos - hg / 2), text=text, fill=(128, 128, 128), font=font)
+            bd, hg = textsize(draw, text, font)
+            draw.text((x_min - s(10) - bd / 2, y_pos - hg / 2), text=text, fill=(128, 128, 128), font=font)
         text = "kW"
-        bd, hg = draw.textsize(text)
-        y_pos = y_max + 10 - 30 * self.prj.pixels_per_kwh
-        draw.text((x_min - bd / 2 - 10, y_pos - hg / 2), text=text, fill=(128, 128, 128), font=font)
+        bd, hg = textsize(draw, text, font)
+        y_pos = y_max + s(10) - 30 * self.prj.pixels_per_kwh
+        draw.text((x_min - bd / 2 - s(10), y_pos - hg / 2), text=text, fill=(128, 128, 128), font=font)
 
+    @profiler.timed("plot_production_pil")
     def plot_production_pil(self, draw, font):
         """
         Plot production collected from GrowattShinephoneServerdata
@@ -788,20 +992,22 @@ class SolarviewApp:
                 y = self.prj.fiveoclockbase - ((time_of_day_m - 5 * 60) / 60) * self.prj.pixels_per_hour
                 draw.line([x, y, x, y - (5.0 / 60) * self.prj.pixels_per_hour], fill=color, width=self.prj.linewidth)
 
+    @profiler.timed("draw_legend_pil")
     def draw_legend_pil(self, draw, font):
-        legend_pos = (self.prj.width - self.prj.rightmargin - 140, self.prj.height - self.prj.bottommargin - 220)
+        s = self.prj.s
+        legend_pos = (self.prj.width - self.prj.rightmargin - s(140), self.prj.height - self.prj.bottommargin - s(220))
         lineno = 0
         power_legend = self.prj.power_legend()
         for l in power_legend:
             colorstr = l[0]
             textstr = l[1]
             draw.line(
-                [legend_pos[0], legend_pos[1] - lineno * 10, legend_pos[0] + 40, legend_pos[1] - lineno * 10],
+                [legend_pos[0], legend_pos[1] - lineno * s(10), legend_pos[0] + s(40), legend_pos[1] - lineno * s(10)],
                 fill=colorstr,
-                width=8,
+                width=int(s(8)),
             )
             draw.text(
-                [legend_pos[0] + 45, legend_pos[1] - 5 - lineno * 10],
+                [legend_pos[0] + s(45), legend_pos[1] - s(5) - lineno * s(10)],
                 text=textstr,
                 fill=(0, 0, 0),
                 font=font,
@@ -811,65 +1017,908 @@ class SolarviewApp:
 
     """ Plot location and power generated this year"""
 
+    @profiler.timed("plot_title_pil")
     def plot_title_pil(self, draw, font, bigfont):
+        s = self.prj.s
         title1str = "{:4}".format(self.gsd.year)
-        bd, hg = draw.textsize(title1str)
+        bd, hg = textsize(draw, title1str, bigfont)
         draw.text(
-            (self.prj.leftmargin + bd / 2, self.prj.topmargin - hg / 2 - 10), text=title1str, fill=0, font=bigfont
+            (self.prj.leftmargin + bd / 2, self.prj.topmargin - hg / 2 - s(10)), text=title1str, fill=0, font=bigfont
         )
 
         title2str = self.gsd.plant_id + " " + self.gsd.plant_name
-        bd, hg = draw.textsize(title2str)
-        title2pos = (self.prj.leftmargin + self.prj.width / 2 - bd / 2, self.prj.topmargin - hg / 2 - 10)
+        bd, hg = textsize(draw, title2str, font)
+        title2pos = (self.prj.leftmargin + self.prj.width / 2 - bd / 2, self.prj.topmargin - hg / 2 - s(10))
         draw.text(title2pos, text=title2str, fill=(0, 0, 0), font=font, align="left")
 
         title3str = "{:0.0f} kWh".format(self.gsd.yearproduction)
-        bd, hg = draw.textsize(title3str)
+        bd, hg = textsize(draw, title3str, bigfont)
         title3pos = (
-            self.prj.width - self.prj.rightmargin - self.prj.leftmargin - bd + 10,
-            self.prj.topmargin - hg / 2 - 10,
+            self.prj.width - self.prj.rightmargin - self.prj.leftmargin - bd + s(10),
+            self.prj.topmargin - hg / 2 - s(10),
         )
         draw.text(title3pos, text=title3str, fill=(0, 0, 0), font=bigfont)
 
-    def create_image_pil(self):
+    @profiler.timed("draw_anomalies_pil")
+    def draw_anomalies_pil(self, draw, font):
+        """
+        Mark the days with an anomaly in a bar above the heatmap
+        """
+        s = self.prj.s
+        y_low = self.prj.fiveoclockbase - 17 * self.prj.pixels_per_hour - s(2)
+        for datestr, kind in self.anomalies.items():
+            if not datestr.startswith(str(self.gsd.year)):
+                continue
+            x = (
+                self.prj.leftmargin
+                + isodate_diff(datestr, "{:4}-01-01".format(self.gsd.year)) * (self.prj.pixels_per_day)
+                + self.prj.pixels_per_day / 2
+            )
+            draw.line([x, y_low, x, y_low - s(8)], fill=self.prj.anomaly_colors[kind], width=self.prj.linewidth)
 
-        self.image = Image.new("RGB", (self.prj.width, self.prj.height), (255, 255, 255))  # white
+    @profiler.timed("load_fonts")
+    def load_fonts(self):
         try:
-            font = ImageFont.truetype("arial.ttf", 10)
-            fontbig = ImageFont.truetype("arial.ttf", 18)
+            font = ImageFont.truetype("arial.ttf", self.prj.fontsize)
+            fontbig = ImageFont.truetype("arial.ttf", self.prj.fontsizebig)
         except IOError:
             try:
-                font = ImageFont.truetype("LiberationSans-Regular.ttf", 10)
-                fontbig = ImageFont.truetype("LiberationSans-Regular", 18)
+                font = ImageFont.truetype("LiberationSans-Regular.ttf", self.prj.fontsize)
+                fontbig = ImageFont.truetype("LiberationSans-Regular.ttf", self.prj.fontsizebig)
             except IOError:
-                font = ImageFont.load_default()
-                fontbig = ImageFont.load_default()
-
-        idraw = ImageDraw.Draw(self.image)
+                try:
+                    font = ImageFont.load_default(self.prj.fontsize)
+                    fontbig = ImageFont.load_default(self.prj.fontsizebig)
+                except TypeError:  # older Pillow, not scalable
+                    font = ImageFont.load_default()
+                    fontbig = ImageFont.load_default()
+        return font, fontbig
+
+    @profiler.timed("create_image_pil")
+    def create_image_pil(self, strip=None):
+        """
+        Draw the heatmap of this year in a new image.
+        With strip=(y0, y1) only that horizontal strip of the heatmap is drawn.
+        """
+        font, fontbig = self.load_fonts()
+        if strip is None:
+            self.image = Image.new("RGB", (self.prj.width, self.prj.height), (255, 255, 255))  # white
+            idraw = ImageDraw.Draw(self.image)
+        else:
+            y0, y1 = strip
+            self.image = Image.new("RGB", (self.prj.width, y1 - y0), (255, 255, 255))  # white
+            idraw = StripDraw(ImageDraw.Draw(self.image), y0, y1)
 
         self.draw_grid_pil(idraw, font, fontbig)
         self.plot_production_pil(idraw, font)
         self.draw_legend_pil(idraw, font)
         self.plot_title_pil(idraw, font, fontbig)
+        if self.anomalies:
+            self.draw_anomalies_pil(idraw, font)
+        return self.image
 
-    def select_year(self):
-        """ Open modal window """
-        selyear = YearSelector(self.parent, self.gsd.yearsavailable).show()
-        if debug:
-            print("Selected year: {}".format(selyear))
 
-        if selyear > 0:
-            self.year = selyear
+class StripDraw:
+    """
+    ImageDraw for the strip y0 .. y1 of a larger image:
+    shifts the y-coordinates and skips lines outside the strip
+    """
+
+    def __init__(self, draw, y0, y1):
+        self.draw = draw
+        self.y0 = y0
+        self.y1 = y1
+
+    def line(self, xy, fill=None, width=1):
+        if isinstance(xy[0], (tuple, list)):
+            xy = [c for point in xy for c in point]
+        ys = xy[1::2]
+        if max(ys) + width < self.y0 or min(ys) - width > self.y1:
+            return
+        self.draw.line([c - self.y0 if i % 2 else c for i, c in enumerate(xy)], fill=fill, width=width)
+
+    def text(self, xy, **kwargs):
+        self.draw.text((xy[0], xy[1] - self.y0), **kwargs)
+
+    def textbbox(self, xy, text, font=None):
+        left, top, right, bottom = self.draw.textbbox((xy[0], xy[1] - self.y0), text, font=font)
+        return left, top + self.y0, right, bottom + self.y0
+
+
+class PngStreamWriter:
+    """
+    Writes an RGB png-file row by row, so the complete bitmap
+    never has to be in memory
+    """
+
+    def __init__(self, filename, width, height, dpi=None):
+        self.width = width
+        self.height = height
+        self.rowlength = 3 * width
+        self.rows_written = 0
+        self.compressor = zlib.compressobj(6)
+        self.pending = []
+        self.pending_size = 0
+        self.file = open(filename, "wb")
+        self.file.write(b"\x89PNG\r\n\x1a\n")
+        self.write_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))  # 8 bit RGB
+        if dpi is not None:
+            ppm = int(round(dpi / 0.0254))  # pixels per metre
+            self.write_chunk(b"pHYs", struct.pack(">IIB", ppm, ppm, 1))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+
+    def write_chunk(self, tag, data):
+        self.file.write(struct.pack(">I", len(data)))
+        self.file.write(tag)
+        self.file.write(data)
+        self.file.write(struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF))
+
+    def write_rows(self, data):
+        """
+        Append one or more rows of raw RGB data (as from Image.tobytes())
+        """
+        for i in range(0, len(data), self.rowlength):
+            self.add_compressed(self.compressor.compress(b"\x00" + data[i : i + self.rowlength]))  # filter type 0
+            self.rows_written += 1
+
+    def add_compressed(self, data):
+        self.pending.append(data)
+        self.pending_size += len(data)
+        if self.pending_size >= 1 << 16:
+            self.flush()
+
+    def flush(self):
+        if self.pending_size > 0:
+            self.write_chunk(b"IDAT", b"".join(self.pending))
+        self.pending = []
+        self.pending_size = 0
+
+    def close(self):
+        if self.rows_written != self.height:
+            raise ValueError("{} rows written, {} expected".format(self.rows_written, self.height))
+        self.add_compressed(self.compressor.flush())
+        self.flush()
+        self.write_chunk(b"IEND", b"")
+        self.file.close()
+
+
+def render_poster(years, filename, columns=None, setprogress=None):
+    """
+    Render the heatmaps of several years side by side into one png-file.
+    With columns, the years are placed in horizontal strips of that many years.
+    Only one year is loaded and drawn at a time: the year images are spilled to
+    temporary files and the png-file is written row by row.
+    """
+    prj = Projection()
+    years = sorted(years)
+    if columns is None or columns > len(years):
+        columns = len(years)
+    strips = [years[i : i + columns] for i in range(0, len(years), columns)]
+    width = columns * prj.width
+    rowlength = 3 * prj.width
+
+    with PngStreamWriter(filename, width, len(strips) * prj.height) as png:
+        yearcount = 0
+        for strip in strips:
+            panels = []
+            for year in strip:
+                gsd = GrowattServerData(year, download=False)
+                image = YearHeatmap(gsd, prj).create_image_pil()
+                panel = tempfile.TemporaryFile()
+                panel.write(image.tobytes())
+                panel.seek(0)
+                panels.append(panel)
+                del gsd, image
+
+                yearcount += 1
+                if setprogress is not None:
+                    setprogress(int(100 * yearcount / len(years)))
+
+            padding = b"\xff" * (rowlength * (columns - len(strip)))  # white
+            for y in range(prj.height):
+                png.write_rows(b"".join(panel.read(rowlength) for panel in panels) + padding)
+            for panel in panels:
+                panel.close()
+
+
+def render_strip(pickle_dir, pickle_template, year, scale, y0, y1, origin=None):
+    """
+    Render the strip y0 .. y1 of the heatmap of a year, returns the raw RGB data
+    and the trace events (profiled when origin is not None).
+    Runs in a worker process, so the settings are passed in.
+    """
+    g.pickle_dir = pickle_dir
+    g.pickle_template = pickle_template
+    if origin is not None:
+        profiler.startworker(origin)
+    with profiler.phase("render_strip", year=year, y0=y0, y1=y1):
+        gsd = GrowattServerData(year, download=False)
+        data = YearHeatmap(gsd, Projection(scale)).create_image_pil(strip=(y0, y1)).tobytes()
+    return data, profiler.takeevents()
+
+
+def render_print(year, filename, scale, dpi=None, stripheight=512, workers=None):
+    """
+    Render the heatmap of a year at a large scale into a png-file.
+    The image is rasterized in horizontal strips by worker processes;
+    the strips are written in order as soon as they are ready, with at most
+    two strips per worker in memory.
+    """
+    prj = Projection(scale)
+    strips = [(y0, min(y0 + stripheight, prj.height)) for y0 in range(0, prj.height, stripheight)]
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    window = 2 * workers
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        with PngStreamWriter(filename, prj.width, prj.height, dpi=dpi) as png:
+            futures = []
+            for y0, y1 in strips:
+                futures.append(
+                    executor.submit(
+                        render_strip, g.pickle_dir, g.pickle_template, year, scale, y0, y1, profiler.workerorigin()
+                    )
+                )
+                if len(futures) >= window:
+                    write_strip(png, futures.pop(0))
+            for future in futures:
+                write_strip(png, future)
+
+
+def write_strip(png, future):
+    data, events = future.result()
+    png.write_rows(data)
+    profiler.merge(events)
+
+
+"""
+Year images rendered in a tile worker process, most recently used last
+"""
+_tile_year_images = {}
+
+
+def _tile_year_image(year, stamp, prj):
+    key = (year, stamp)
+    if key in _tile_year_images:
+        _tile_year_images[key] = _tile_year_images.pop(key)
+    else:
+        gsd = GrowattServerData(year, download=False)
+        _tile_year_images[key] = YearHeatmap(gsd, prj).create_image_pil()
+        while len(_tile_year_images) > 4:
+            del _tile_year_images[next(iter(_tile_year_images))]
+    return _tile_year_images[key]
+
+
+def render_tile(pickle_dir, pickle_template, years, stamps, z, tx, ty, filename, origin=None):
+    """
+    Render tile (tx, ty) of zoom level z of a TilePyramid and write it to filename,
+    returns the trace events (profiled when origin is not None).
+    Runs in a worker process, so the settings are passed in.
+    """
+    g.pickle_dir = pickle_dir
+    g.pickle_template = pickle_template
+    if origin is not None:
+        profiler.startworker(origin)
+    with profiler.phase("render_tile", z=z, tx=tx, ty=ty):
+        _render_tile(years, stamps, z, tx, ty, filename)
+    return profiler.takeevents()
+
+
+def _render_tile(years, stamps, z, tx, ty, filename):
+    prj = Projection()
+    size = TilePyramid.tilesize
+    factor = 2.0 ** z
+
+    """ part of the timeline (years side by side) covered by this tile """
+    x0 = int(tx * size / factor)
+    width = int(size / factor)
+    y0 = ty * size
+    source = Image.new("RGB", (width, size), (255, 255, 255))
+    for panel in range(x0 // prj.width, min(len(years), (x0 + width - 1) // prj.width + 1)):
+        image = _tile_year_image(years[panel], stamps[panel], prj)
+        left = max(x0, panel * prj.width)
+        right = min(x0 + width, (panel + 1) * prj.width)
+        crop = image.crop((left - panel * prj.width, y0, right - panel * prj.width, min(y0 + size, image.height)))
+        source.paste(crop, (left - x0, 0))
+
+    if factor > 1:
+        tile = source.resize((size, size), Image.NEAREST)  # keep the day lines sharp
+    elif factor < 1:
+        tile = source.resize((size, size), Image.BOX)
+    else:
+        tile = source
+
+    filename = Path(filename)
+    filename.parent.mkdir(parents=True, exist_ok=True)
+    tmpfilename = filename.with_suffix(".tmp")
+    tile.save(tmpfilename, format="PNG")
+    tmpfilename.replace(filename)
+
+
+class TilePyramid:
+    """
+    The heatmaps of several years side by side (as the poster), cut into
+    tiles of tilesize x tilesize pixels at several zoom levels.
+    Zoom level z stretches the timeline horizontally by 2 ** z, the height is not scaled.
+    Tiles are rendered lazily in worker processes and cached in g.tile_dir.
+    The name of a tile contains a stamp of the datafiles it shows, so tiles
+    of a year that has been updated are rendered again.
+    """
+
+    tilesize = 256
+    minzoom = -3  # about 4 years in a window
+    maxzoom = 3  # about 2 weeks in a window
+
+    def __init__(self, years, workers=None):
+        self.years = sorted(years)
+        self.prj = Projection()
+        self.stamps = [datastamp(year) for year in self.years]
+        """ spawn, not fork: the gui process has other threads running (TimelineIndex) """
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self.pending = {}  # key: future
+        self.ready = queue.Queue()  # keys of tiles rendered, filled by the executor
+        self.remove_stale_tiles()
+
+    def refresh_stamps(self):
+        """
+        Return True if a datafile has changed; its tiles will be rendered again
+        """
+        stamps = [datastamp(year) for year in self.years]
+        changed = stamps != self.stamps
+        self.stamps = stamps
+        if changed:
+            self.remove_stale_tiles()
+        return changed
+
+    def remove_stale_tiles(self):
+        """
+        Delete the cached tiles of data that have changed since, or of other years
+        """
+        for zoomdir in g.tile_dir.glob("*"):
+            try:
+                z = int(zoomdir.name)
+            except ValueError:
+                continue
+            for filename in zoomdir.glob("*.png"):
+                try:
+                    tx, ty, stamp = filename.stem.split("_")
+                    current = self.tilepath(z, int(tx), int(ty))
+                except ValueError:
+                    continue
+                if filename.name != current.name:
+                    try:
+                        filename.unlink()
+                    except OSError:  # in use, e.g. by another viewer
+                        pass
+
+    def width(self, z):
+        return int(len(self.years) * self.prj.width * 2.0 ** z)
+
+    def height(self, z):
+        return self.prj.height
+
+    def tilepath(self, z, tx, ty):
+        factor = 2.0 ** z
+        x0 = tx * self.tilesize / factor
+        x1 = (tx + 1) * self.tilesize / factor
+        panels = range(int(x0 // self.prj.width), min(len(self.years), int(math.ceil(x1 / self.prj.width))))
+        stamp = hashlib.md5(
+            " ".join("{}:{}".format(self.years[p], self.stamps[p]) for p in panels).encode("utf-8")
+        ).hexdigest()[:12]
+        return g.tile_dir / str(z) / "{}_{}_{}.png".format(tx, ty, stamp)
+
+    def visible_tiles(self, z, x0, y0, x1, y1):
+        """
+        Tiles (tx, ty) covering the area x0, y0 - x1, y1 of zoom level z
+        """
+        tx_max = int(math.ceil(self.width(z) / self.tilesize)) - 1
+        ty_max = int(math.ceil(self.height(z) / self.tilesize)) - 1
+        for ty in range(max(0, int(y0 // self.tilesize)), min(ty_max, int(y1 // self.tilesize)) + 1):
+            for tx in range(max(0, int(x0 // self.tilesize)), min(tx_max, int(x1 // self.tilesize)) + 1):
+                yield tx, ty
+
+    def gettile(self, z, tx, ty):
+        """
+        Return the filename of a tile, or None if it is not available yet.
+        In that case the tile is rendered in the background and its key
+        will appear in self.ready.
+        """
+        filename = self.tilepath(z, tx, ty)
+        if filename.exists():
+            return filename
+        key = (z, tx, ty)
+        if key not in self.pending:
+            future = self.executor.submit(
+                render_tile,
+                g.pickle_dir,
+                g.pickle_template,
+                self.years,
+                self.stamps,
+                z,
+                tx,
+                ty,
+                str(filename),
+                profiler.workerorigin(),
+            )
+            self.pending[key] = future
+            future.add_done_callback(lambda future, key=key: self.tiledone(key, future))
+        return None
+
+    def tiledone(self, key, future):
+        self.pending.pop(key, None)
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            if debug:
+                print("render_tile {}: {}".format(key, future.exception()))
+            return
+        profiler.merge(future.result())
+        self.ready.put(key)
+
+    def cancel_other_zoomlevels(self, z):
+        for key, future in list(self.pending.items()):
+            if key[0] != z:
+                future.cancel()
+
+    def close(self):
+        for future in list(self.pending.values()):
+            future.cancel()
+        self.executor.shutdown(wait=False)
+
+
+class HeatmapIndex:
+    """
+    Maps a pixel of the heatmap of a year to the stored values in constant time,
+    with the same Projection mapping as plot_production_pil:
+    - a list with the date for each x (all pixels_per_day columns of a day)
+    - per day a dict slot (5 minutes): (timestamp, power); the slot follows from y
+    """
+
+    def __init__(self, gsd, prj):
+        self.gsd = gsd
+        self.prj = prj
+        self.columns = [None] * prj.width
+        self.slots = {}
+        for datestr, day in gsd.days.items():
+            x0 = prj.leftmargin + isodate_diff(datestr, "{:4}-01-01".format(gsd.year)) * prj.pixels_per_day
+            for x in range(max(0, x0), min(prj.width, x0 + prj.pixels_per_day)):
+                self.columns[x] = datestr
+            self.slots[datestr] = {int(isotime_to_m(ts)) // 5: (ts, power) for ts, power in day.samples.items()}
+
+    def lookup(self, x, y):
+        """
+        Return (datestr, timestamp, power) for a pixel in the heatmap,
+        (datestr, None, energy of the day) below it, or None
+        """
+        x = int(x)
+        if not 0 <= x < len(self.columns) or self.columns[x] is None:
+            return None
+        datestr = self.columns[x]
+        if y > self.prj.fiveoclockbase:
+            if y <= self.prj.height - self.prj.bottommargin:
+                return (datestr, None, self.gsd.days[datestr].todayenergy)
+            return None
+        slot = int((self.prj.fiveoclockbase - y) / self.prj.pixels_per_hour * 12) + 5 * 12
+        sample = self.slots[datestr].get(slot)
+        if sample is None:
+            return None
+        return (datestr,) + sample
+
+
+class TimelineIndex:
+    """
+    HeatmapIndex for the timeline of a TilePyramid: x is mapped to the year and
+    the x within its heatmap. The indexes are built in a background thread, a year
+    has no tooltips until its index matches the stamp in the pyramid
+    """
+
+    def __init__(self, pyramid):
+        self.pyramid = pyramid
+        self.indexes = {}  # year: (stamp, HeatmapIndex)
+        self.build()
+
+    def build(self):
+        """ Start (re)building the indexes of the years whose stamp changed """
+        todo = [
+            (year, stamp)
+            for year, stamp in zip(self.pyramid.years, self.pyramid.stamps)
+            if self.indexes.get(year, (None, None))[0] != stamp
+        ]
+        if todo:
+            threading.Thread(target=self.build_indexes, args=(todo,), daemon=True).start()
+
+    def build_indexes(self, todo):
+        for year, stamp in todo:
+            gsd = GrowattServerData(year, download=False)
+            self.indexes[year] = (stamp, HeatmapIndex(gsd, self.pyramid.prj))
+
+    def lookup(self, x, y, z):
+        x = x / 2.0 ** z
+        panel = int(x // self.pyramid.prj.width)
+        if not 0 <= panel < len(self.pyramid.years):
+            return None
+        stamp, index = self.indexes.get(self.pyramid.years[panel], (None, None))
+        if stamp != self.pyramid.stamps[panel]:
+            return None
+        return index.lookup(x - panel * self.pyramid.prj.width, y)
+
+
+class YearSelector(simpledialog.Dialog):
+    def __init__(self, parent, years):
+        """ Init progress window """
+        self.parent = parent
+        tk.Toplevel.__init__(self, master=parent)
+        self.year = 0
+
+        """ Create progress window """
+        self.focus_set()  # set focus on the ProgressWindow
+        self.grab_set()  # make a modal window, so all events go to the ProgressWindow
+        self.transient(self.master)  # show only one window in the task bar
+        #
+        self.title("Select year to plot")
+        self.resizable(False, False)  # window is not resizable
+        # self.close gets fired when the window is destroyed
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        # Set proper position over the parent window
+        self.geometry("200x200+100+100")
+        self.bind("<Escape>", self.close)  # cancel progress when <Escape> key is pressed
+
+        self.lbx = tk.Listbox(self)
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+        self.lbx.grid(row=0, column=0, sticky=tk.NSEW)
+        self.lbx.bind("<Double-Button-1>", self.lbxdoubleclick)
+        self.sb1 = tk.Scrollbar(self, orient=tk.VERTICAL)
+        self.sb1.grid(row=0, column=1, sticky=tk.NS + tk.E)
+        self.sb1.config(command=self.yview)
+        self.lbx.configure(yscrollcommand=self.sb1.set)
+
+        for item in years:
+            self.lbx.insert(tk.END, item)
+
+    def yview(self, *args):
+        self.lbx.yview(*args)
+
+    def lbxdoubleclick(self, event):
+        self.lbxlineselected()
+
+    def lbxlineselected(self):
+        selection = self.lbx.curselection()
+        if len(selection) > 0:
+            self.year = int(self.lbx.get(selection[0]))  # take first line
+            self.close()
+
+    def show(self):
+        self.wait_window()
+        return self.year
+
+    def close(self, event=None):
+        """ Close progress window """
+        self.parent.focus_set()  # put focus back to the parent window
+        self.destroy()  # destroy progress window
+
+
+class ProgressWindow(simpledialog.Dialog):
+    def __init__(self, parent, text):
+        """ Init progress window """
+        tk.Toplevel.__init__(self, master=parent)
+        self.parent = parent
+        self.text = text
+        self.length = 300
+
+        self.maximum = 100
+
+        self.focus_set()  # set focus on the ProgressWindow
+
+        self.wait_visibility()
+        self.grab_set()  # make a modal window, so all events go to the ProgressWindow
+        self.transient(self.master)  # show only one window in the task bar
+        #
+        self.title("Downloading data for {}".format(self.text))
+        self.resizable(False, False)  # window is not resizable
+        # self.close gets fired when the window is destroyed
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        # Set proper position over the parent window
+        self.geometry("300x30+100+100")
+
+        self.num = tk.IntVar()
+
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+        self.pgb = ttk.Progressbar(
+            self, maximum=self.maximum, orient="horizontal", length=self.length, variable=self.num, mode="determinate"
+        )
+        self.pgb.grid(row=0, column=0, sticky=tk.NSEW)
+
+        self.num.set(0)
+
+    def set(self, value):
+        self.num.set(value)
+        self.pgb.update()
+
+    def close(self, event=None):
+        """ Close progress window """
+        self.master.focus_set()  # put focus back to the parent window
+        self.destroy()  # destroy progress window
+
+
+class SolarviewApp:
+    """
+    Shows the heatmap; with viewer=True data are only read from the local datafiles,
+    as written by the collector.
+    Changed datafiles are noticed by their stamp and reloaded.
+    """
+
+    storepollinterval = 5000  # ms
+
+    def __init__(self, parent, viewer=False):
+
+        self.parent = parent
+        self.viewer = viewer
+        self.parent.title("Solarview - Growatt server annual overview")
+        g.gui = True
+        readinifile()
+
+        self.createmenubar(self.parent)
+
+        self.prj = Projection()
+
+        self.canvas = tk.Canvas(
+            self.parent,
+            scrollregion=(0, 0, self.prj.width, self.prj.height),
+            width=self.prj.width,  # Ruud: make it not too large
+            height=self.prj.height,  # Ruud: make it not too large
+            bg="white",
+            bd=0,
+            highlightthickness=0,
+        )
+
+        self.canvas.grid(row=0, column=0)
+
+        self.pyramid = None  # TilePyramid when the timeline is shown
+        self.zoom = 0
+        self.tiles = {}  # (tx, ty): (canvas item, PhotoImage) of the timeline
+        self.pollid = None
+
+        self.index = None  # HeatmapIndex or TimelineIndex, for the tooltip
+        self.tooltip = None
+
+        self.make_scrollbars()
+        self.canvas.bind("<Configure>", self.update_tiles)
+        self.canvas.bind("<Motion>", self.show_tooltip)
+        self.canvas.bind("<Leave>", self.hide_tooltip)
+        self.canvas.update()
+
+        self.year = dt.datetime.now().year
+        self.load_year()
+        self.show_year()
+        self.parent.after(self.storepollinterval, self.poll_store)
 
+    def load_year(self):
+        if self.viewer:
+            self.gsd = GrowattServerData(self.year, download=False)
+        else:
             self.pgw = ProgressWindow(None, str(self.year))
             self.gsd = GrowattServerData(self.year, setprogress=self.pgw.set)
             self.pgw.close()
+        self.stamp = datastamp(self.year)
 
-            self.create_image_pil()
+    def show_year(self):
+        self.image = YearHeatmap(self.gsd, self.prj).create_image_pil()
+        with profiler.phase("PhotoImage"):
             self.imagetk = ImageTk.PhotoImage(self.image)
-            self.canvas.create_image(0, 0, image=self.imagetk, anchor=tk.NW)
+        self.canvas.delete("all")
+        self.tooltip = None
+        self.canvas.create_image(0, 0, image=self.imagetk, anchor=tk.NW)
+        self.index = HeatmapIndex(self.gsd, self.prj)
+
+        self.canvas.update()
+
+    def poll_store(self):
+        """
+        Reload the year shown, or rerender the timeline, when its datafile has been written
+        """
+        if self.pyramid is not None:
+            if self.pyramid.refresh_stamps():
+                for item, photo in self.tiles.values():
+                    self.canvas.delete(item)
+                self.tiles = {}
+                self.update_tiles()
+                self.index.build()
+        elif datastamp(self.year) != self.stamp:
+            self.stamp = datastamp(self.year)
+            self.gsd = GrowattServerData(self.year, download=False)
+            self.show_year()
+        self.parent.after(self.storepollinterval, self.poll_store)
+
+    def make_scrollbars(self):
+        self.sy = tk.Scrollbar(orient=tk.VERTICAL, command=self.canvas.yview)
+        self.sy.grid(row=0, column=1, sticky=tk.NS)
+        self.canvas.configure(yscrollcommand=self.yscrolled)
 
-            self.canvas.update()
+        self.sx = tk.Scrollbar(orient=tk.HORIZONTAL, command=self.canvas.xview)
+        self.sx.grid(row=1, column=0, sticky=tk.EW)
+        self.canvas.configure(xscrollcommand=self.xscrolled)
+
+        top = self.canvas.winfo_toplevel()
+        top.rowconfigure(0, weight=1)
+        top.columnconfigure(0, weight=1)
+        self.canvas.grid(row=0, column=0, sticky=tk.NSEW)
+
+    def xscrolled(self, *args):
+        self.sx.set(*args)
+        self.update_tiles()
+
+    def yscrolled(self, *args):
+        self.sy.set(*args)
+        self.update_tiles()
+
+    def createmenubar(self, root):
+        menubar = tk.Menu(root)
+        filemenu = tk.Menu(menubar, tearoff=0)
+        filemenu.add_command(label="Select year", command=self.select_year)
+        filemenu.add_command(label="Save image", command=self.save_image)
+        filemenu.add_separator()
+        filemenu.add_command(label="Exit", command=root.destroy)
+        menubar.add_cascade(label="File", menu=filemenu)
+        viewmenu = tk.Menu(menubar, tearoff=0)
+        viewmenu.add_command(label="Timeline of all years", command=self.show_timeline)
+        viewmenu.add_command(label="Zoom in", accelerator="+", command=lambda: self.set_zoom(self.zoom + 1))
+        viewmenu.add_command(label="Zoom out", accelerator="-", command=lambda: self.set_zoom(self.zoom - 1))
+        menubar.add_cascade(label="View", menu=viewmenu)
+        root.config(menu=menubar)
+        root.bind("+", lambda event: self.set_zoom(self.zoom + 1))
+        root.bind("-", lambda event: self.set_zoom(self.zoom - 1))
+
+    def select_year(self):
+        """ Open modal window """
+        selyear = YearSelector(self.parent, self.gsd.yearsavailable).show()
+        if debug:
+            print("Selected year: {}".format(selyear))
+
+        if selyear > 0:
+            self.year = selyear
+            self.close_timeline()
+            self.load_year()
+            self.show_year()
+
+    def show_timeline(self):
+        """
+        Show all years available locally side by side, drawn from tiles
+        """
+        years = GrowattServerData.yearsavailablelocally()
+        if not years:
+            return
+        self.close_timeline()
+        self.pyramid = TilePyramid(years)
+        self.index = TimelineIndex(self.pyramid)
+        self.canvas.delete("all")
+        self.tooltip = None
+        self.zoom = 0
+        self.set_zoom(0)
+        self.poll_tiles()
+
+    def close_timeline(self):
+        if self.pollid is not None:
+            self.parent.after_cancel(self.pollid)
+            self.pollid = None
+        if self.pyramid is not None:
+            self.pyramid.close()
+            self.pyramid = None
+            self.tiles = {}
+            self.index = None
+            self.canvas.delete("all")
+            self.tooltip = None
+            self.canvas.configure(scrollregion=(0, 0, self.prj.width, self.prj.height))
+
+    def set_zoom(self, zoom):
+        if self.pyramid is None:
+            return
+        zoom = max(TilePyramid.minzoom, min(TilePyramid.maxzoom, zoom))
+
+        """ keep the centre of the window in place """
+        left, right = self.canvas.xview()
+        centre = (left + right) / 2
+
+        self.zoom = zoom
+        self.pyramid.cancel_other_zoomlevels(zoom)
+        for item, photo in self.tiles.values():
+            self.canvas.delete(item)
+        self.tiles = {}
+        self.canvas.configure(scrollregion=(0, 0, self.pyramid.width(zoom), self.pyramid.height(zoom)))
+        self.canvas.xview_moveto(max(0.0, centre - (right - left) / 2))
+        self.update_tiles()
+
+    def update_tiles(self, event=None):
+        """
+        Show the tiles in view and forget the others; missing tiles are requested
+        """
+        if self.pyramid is None:
+            return
+        x0 = self.canvas.canvasx(0)
+        y0 = self.canvas.canvasy(0)
+        x1 = self.canvas.canvasx(self.canvas.winfo_width())
+        y1 = self.canvas.canvasy(self.canvas.winfo_height())
+        visible = set(self.pyramid.visible_tiles(self.zoom, x0, y0, x1, y1))
+
+        for key in list(self.tiles):
+            if key not in visible:
+                self.canvas.delete(self.tiles.pop(key)[0])
+
+        for tx, ty in visible:
+            if (tx, ty) in self.tiles:
+                continue
+            filename = self.pyramid.gettile(self.zoom, tx, ty)
+            if filename is not None:
+                photo = ImageTk.PhotoImage(Image.open(filename))
+                item = self.canvas.create_image(
+                    tx * TilePyramid.tilesize, ty * TilePyramid.tilesize, image=photo, anchor=tk.NW
+                )
+                self.tiles[(tx, ty)] = (item, photo)
+
+    def poll_tiles(self):
+        """
+        Show tiles rendered in the background
+        """
+        if self.pyramid is None:
+            return
+        rendered = False
+        while not self.pyramid.ready.empty():
+            self.pyramid.ready.get()
+            rendered = True
+        if rendered:
+            self.update_tiles()
+        self.pollid = self.parent.after(100, self.poll_tiles)
+
+    def show_tooltip(self, event):
+        """
+        Show date, time and power of the pixel under the mouse
+        """
+        if self.index is None:
+            return
+        x = self.canvas.canvasx(event.x)
+        y = self.canvas.canvasy(event.y)
+        if self.pyramid is not None:
+            found = self.index.lookup(x, y, self.zoom)
+        else:
+            found = self.index.lookup(x, y)
+        if found is None:
+            self.hide_tooltip()
+            return
+
+        datestr, ts, value = found
+        if ts is None:
+            text = "{}  {:0.1f} kWh".format(datestr, value)
+        else:
+            text = "{} {}  {:0.0f} W".format(datestr, ts, value)
+
+        if self.tooltip is None:
+            self.tooltip = (
+                self.canvas.create_rectangle(0, 0, 0, 0, fill="#FFFFE0", outline="#808080"),
+                self.canvas.create_text(0, 0, anchor=tk.NW),
+            )
+        rectangle, label = self.tooltip
+        self.canvas.itemconfigure(label, text=text, state=tk.NORMAL)
+        self.canvas.coords(label, x + 12, y + 12)
+        self.canvas.coords(rectangle, *self.canvas.bbox(label))
+        self.canvas.itemconfigure(rectangle, state=tk.NORMAL)
+        self.canvas.tag_raise(rectangle)
+        self.canvas.tag_raise(label)
+
+    def hide_tooltip(self, event=None):
+        if self.tooltip is not None:
+            for item in self.tooltip:
+                self.canvas.itemconfigure(item, state=tk.HIDDEN)
 
     def save_image(self):
         myFormats = [("Portable Network Graphics", "*.png"), ("JPEG / JFIF", "*.jpg")]
@@ -884,11 +1933,883 @@ class SolarviewApp:
         pass
 
 
+"""
+Export of the stored data, as a pipeline of generators:
+only one year is in memory and rows are written per chunk
+"""
+
+
+def iter_days(years, start=None, end=None, plant=None):
+    """
+    Yield (plant_id, ShinePhoneDayData) for the stored days from start to end (inclusive, "YYYY-MM-DD"),
+    optionally only of the plant with this id or name.
+    plant_id is None if the datafile has no plant stored.
+    """
+    for year in sorted(years):
+        if (start is not None and year < int(start[:4])) or (end is not None and year > int(end[:4])):
+            continue
+        gsd = GrowattServerData(year, download=False)
+        plant_id = None if gsd.plant_id == GrowattServerData.unknown_plant_id else str(gsd.plant_id)
+        if plant is not None:
+            if plant_id is None:
+                print("{}: no plant stored, skipped for --plant {}".format(year, plant), file=sys.stderr)
+                continue
+            if plant not in (plant_id, gsd.plant_name):
+                continue
+        for datestr in sorted(gsd.days):
+            if (start is None or datestr >= start) and (end is None or datestr <= end):
+                yield plant_id, gsd.days[datestr]
+
+
+def iter_sample_rows(days):
+    for plant_id, day in days:
+        for ts in sorted(day.samples, key=isotime_to_m):
+            yield (plant_id, day.datestr, ts, day.samples[ts])
+
+
+def iter_day_rows(days):
+    for plant_id, day in days:
+        yield (plant_id, day.datestr, day.todayenergy, len(day.samples))
+
+
+export_tables = {
+    # table: (row generator, column names)
+    "samples": (iter_sample_rows, ("plant_id", "date", "time", "power_w")),
+    "days": (iter_day_rows, ("plant_id", "date", "energy_kwh", "samples")),
+}
+
+
+def chunked(rows, chunksize):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunksize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def write_csv(chunks, columns, filename):
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for chunk in chunks:
+            writer.writerows(chunk)
+
+
+def write_arrow(chunks, columns, filename, fileformat):
+    """
+    Write the chunks as row groups of a parquet-file, or as record batches of an arrow-file
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        sys.exit("pyarrow is needed to export to {}".format(fileformat))
+
+    types = {
+        "plant_id": pa.string(),
+        "date": pa.date32(),
+        "time": pa.string(),
+        "power_w": pa.float64(),
+        "energy_kwh": pa.float64(),
+        "samples": pa.int32(),
+    }
+    schema = pa.schema([(column, types[column]) for column in columns])
+
+    if fileformat == "parquet":
+        writer = pq.ParquetWriter(filename, schema)
+        write = writer.write_table
+    else:
+        writer = pa.ipc.new_file(filename, schema)
+        write = writer.write
+    try:
+        for chunk in chunks:
+            data = [list(values) for values in zip(*chunk)]
+            data[1] = [dt.date(*map(int, datestr.split("-"))) for datestr in data[1]]
+            arrays = [pa.array(values, type=schema.field(i).type) for i, values in enumerate(data)]
+            batch = pa.record_batch(arrays, schema=schema)
+            write(pa.Table.from_batches([batch]) if fileformat == "parquet" else batch)
+    finally:
+        writer.close()
+
+
+def export(filename, table="samples", fileformat=None, start=None, end=None, plant=None, chunksize=10000):
+    """
+    Export the stored days from start to end to a csv-, parquet- or arrow-file
+    """
+    if fileformat is None:
+        fileformat = {".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow"}.get(Path(filename).suffix, "csv")
+    rowgenerator, columns = export_tables[table]
+    days = iter_days(GrowattServerData.yearsavailablelocally(), start=start, end=end, plant=plant)
+    chunks = chunked(rowgenerator(days), chunksize)
+    if fileformat == "csv":
+        write_csv(chunks, columns, filename)
+    else:
+        write_arrow(chunks, columns, filename, fileformat)
+
+
+"""
+Import of history exported from the Growatt web portal (csv or xlsx),
+so back-filling does not need a day call per historical day
+"""
+
+portal_time_columns = ("time", "date", "datetime", "timestamp")
+portal_power_columns = ("pac", "ppv", "power")
+portal_energy_columns = ("eac today", "etoday", "e_today", "energy today")  # kWh of the day so far
+portal_time_formats = (
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y/%m/%d %H:%M:%S",
+    "%Y/%m/%d %H:%M",
+    "%d-%m-%Y %H:%M:%S",
+    "%d-%m-%Y %H:%M",
+    "%d/%m/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M",
+)
+
+
+def portal_export_rows(filename, delimiter=None):
+    """
+    Yield the rows of a portal export as lists of cells.
+    The delimiter of a csv-file is detected, unless given; "," if detection fails.
+    """
+    if Path(filename).suffix.lower() in (".xlsx", ".xlsm"):
+        try:
+            import openpyxl
+        except ImportError:
+            sys.exit("openpyxl is needed to import {}".format(filename))
+        workbook = openpyxl.load_workbook(filename, read_only=True, data_only=True)
+        for row in workbook.active.iter_rows(values_only=True):
+            yield list(row)
+        workbook.close()
+    else:
+        with open(filename, newline="", encoding="utf-8-sig") as f:
+            if delimiter is None:
+                try:
+                    delimiter = csv.Sniffer().sniff(f.read(4096), delimiters=",;\t").delimiter
+                except csv.Error:
+                    delimiter = ","
+                f.seek(0)
+            yield from csv.reader(f, delimiter=delimiter)
+
+
+def parse_portal_timestamp(value):
+    if isinstance(value, dt.datetime):
+        return value
+    value = str(value).strip()
+    for timeformat in portal_time_formats:
+        try:
+            return dt.datetime.strptime(value, timeformat)
+        except ValueError:
+            pass
+    return None
+
+
+def parse_portal_export(filename, timecolumn=None, powercolumn=None, delimiter=None):
+    """
+    Yield (timestamp, power in W, energy of the day so far in kWh or None) from a portal export.
+    The header is the first row with a time and a power column; the portal puts
+    some lines with plant and inverter information above it.
+    """
+    rows = portal_export_rows(filename, delimiter)
+    for row in rows:
+        names = [str(cell).strip().lower() if cell is not None else "" for cell in row]
+        if timecolumn is not None:
+            timeindex = names.index(timecolumn.lower()) if timecolumn.lower() in names else None
+        else:
+            timeindex = next((i for i, name in enumerate(names) if name.startswith(portal_time_columns)), None)
+        if powercolumn is not None:
+            powerindex = names.index(powercolumn.lower()) if powercolumn.lower() in names else None
+        else:
+            powerindex = next(
+                (i for i, name in enumerate(names) if name.startswith(portal_power_columns) and "(w)" in name), None
+            )
+            if powerindex is None:
+                powerindex = next((i for i, name in enumerate(names) if name.startswith(portal_power_columns)), None)
+        if timeindex is not None and powerindex is not None:
+            break
+    else:
+        raise ValueError("{}: no time and power column found".format(filename))
+    energyindex = next((i for i, name in enumerate(names) if name.startswith(portal_energy_columns)), None)
+
+    for row in rows:
+        if len(row) <= max(timeindex, powerindex):
+            continue
+        timestamp = parse_portal_timestamp(row[timeindex])
+        try:
+            power = float(str(row[powerindex]).replace(",", "."))
+        except ValueError:
+            continue
+        energy = None
+        if energyindex is not None and energyindex < len(row):
+            try:
+                energy = float(str(row[energyindex]).replace(",", "."))
+            except ValueError:
+                pass
+        if timestamp is not None:
+            yield timestamp, power, energy
+
+
+def portal_export_days(records):
+    """
+    Convert (timestamp, power, energy) to ShinePhoneDayData, with samples per 5 minutes
+    as the day data of the server (the mean of the rows within a 5 minutes slot).
+    The energy of the day is the highest day energy of the export if it has that column,
+    else the power integrated over the real intervals between the rows, so an export
+    with a row every 10 or 15 minutes gives the same energy.
+    """
+    days = {}
+    slots = {}  # (datestr, slot): [sum, count]
+    powers = {}  # datestr: [(timestamp, power)]
+    energies = {}  # datestr: highest day energy
+    for timestamp, power, energy in sorted(records, key=lambda record: record[0]):
+        datestr = timestamp.strftime("%Y-%m-%d")
+        if datestr not in days:
+            days[datestr] = ShinePhoneDayData(datestr=datestr, todayenergy=0)
+            powers[datestr] = []
+        minute = timestamp.minute - timestamp.minute % 5
+        slot = slots.setdefault((datestr, "{:02}:{:02}".format(timestamp.hour, minute)), [0.0, 0])
+        slot[0] += power
+        slot[1] += 1
+        powers[datestr].append((timestamp, power))
+        if energy is not None:
+            energies[datestr] = max(energy, energies.get(datestr, 0.0))
+    for (datestr, slot), (total, count) in slots.items():
+        days[datestr].samples[slot] = total / count
+    for datestr, day in days.items():
+        if datestr in energies:
+            day.todayenergy = energies[datestr]
+        else:
+            samples = powers[datestr]
+            day.todayenergy = sum(
+                (p0 + p1) / 2 * (t1 - t0).total_seconds() / 3600 for (t0, p0), (t1, p1) in zip(samples, samples[1:])
+            ) / 1000  # kWh
+    return days
+
+
+def download_month_energy(months):
+    """
+    Return {datestr: energy in kWh} of the given months ("YYYY-MM") from the server,
+    or None if the server is not available
+    """
+    result = {}
+    try:
+        with GrowattApi() as gwa:
+            gwa.login(g.username, g.password)
+            plant_id = gwa.plant_list()["data"][0]["plantId"]
+            for month in months:
+                firstday = dt.datetime(int(month[:4]), int(month[5:7]), 1)
+                monthdata = gwa.new_plant_detail(plant_id, Timespan.month, firstday)["data"]
+                for day in monthdata:
+                    result["{}-{}".format(month, day)] = float(monthdata[day])
+    except LoginError:
+        showerror("Login Error", "Username / password not correct")
+        return None
+    except (GrowattApiError, requests.exceptions.RequestException):  # no connection, timeout
+        showerror("Connection Error", "No connection to Growatt servers")
+        return None
+    return result
+
+
+def import_portal_exports(
+    filenames,
+    timecolumn=None,
+    powercolumn=None,
+    delimiter=None,
+    validate=True,
+    tolerance=0.1,
+    download=True,
+    overwrite=False,
+):
+    """
+    Import portal exports into the local datafiles.
+    - with validate, the energy of each imported day is compared with the month data of
+      the server (one call per month); days differing more than tolerance are not imported,
+      the others get the energy of the server. If the month data can not be read,
+      nothing is imported.
+    - days already stored with samples are kept, unless overwrite
+    - with download, the days of these years not covered by the exports are downloaded
+    Returns a dict with the imported, rejected and downloaded dates.
+    """
+    days = {}
+    for filename in filenames:
+        days.update(portal_export_days(parse_portal_export(filename, timecolumn, powercolumn, delimiter)))
+    report = {"imported": [], "rejected": [], "downloaded": []}
+
+    if validate and days:
+        reference = download_month_energy(sorted({datestr[:7] for datestr in days}))
+        if reference is None:
+            sys.exit("Month data not available to validate the import, nothing imported (see --no-validate)")
+        for datestr in sorted(days):
+            energy = reference.get(datestr)
+            if energy is None or abs(days[datestr].todayenergy - energy) > tolerance * energy + 0.1:
+                report["rejected"].append(datestr)
+                del days[datestr]
+            else:
+                days[datestr].todayenergy = energy
+
+    now = dt.datetime.now()
+    for year in sorted({int(datestr[:4]) for datestr in days}):
+        gsd = GrowattServerData(year, download=False)
+        for datestr in sorted(days):
+            if datestr.startswith(str(year)):
+                if overwrite or datestr not in gsd.days or not gsd.days[datestr].samples:
+                    gsd.days[datestr] = days[datestr]
+                    report["imported"].append(datestr)
+
+        end_date = min(now, dt.datetime(year, 12, 31))
+        missing = [
+            d
+            for d in daterange(dt.datetime(year, 1, 1), end_date)
+            if d.strftime("%Y-%m-%d") not in gsd.days or not gsd.days[d.strftime("%Y-%m-%d")].samples
+        ]
+        if download and missing:
+            if gsd.downloadgrowattdata(missing[0], missing[-1], dates=missing):
+                report["downloaded"].extend(d.strftime("%Y-%m-%d") for d in missing)
+                if year < now.year:
+                    gsd.year_complete = True
+        elif download and year < now.year:
+            gsd.year_complete = True
+        if not gsd.yearproduction:
+            gsd.yearproduction = sum(day.todayenergy for day in gsd.days.values())
+        gsd.dump_to_picklefile(year)
+    return report
+
+
+def collect(interval=15, once=False):
+    """
+    Refresh the datafiles of this year (and of last year, until complete) every interval minutes,
+    without gui. The gui can then run with --viewer and only read the datafiles.
+    """
+    while True:
+        now = dt.datetime.now()
+        for year in (now.year - 1, now.year):
+            if year == now.year or picklefilename(year).exists():
+                try:
+                    gsd = GrowattServerData(year)
+                    print("{} {}: {} days stored".format(nowstr(), year, len(gsd.days)))
+                except Exception as e:  # e.g. throttling page instead of json: retry next time
+                    print("{} {}: refresh failed: {!r}".format(nowstr(), year, e), file=sys.stderr)
+        sys.stdout.flush()
+        if once:
+            break
+        time.sleep(60 * interval)
+
+
+class ImageCache:
+    """
+    Png images of the heatmaps per year, rendered by YearHeatmap and kept in memory
+    as long as the stamp of the datafile is unchanged. Thread safe; a year is
+    rendered by one thread at a time, the others wait for the result.
+    """
+
+    def __init__(self):
+        self.images = {}  # year: (stamp, png, etag, last modified)
+        self.lock = threading.Lock()
+        self.yearlocks = {}
+
+    def get(self, year):
+        stamp = datastamp(year)
+        entry = self.images.get(year)
+        if entry is not None and entry[0] == stamp:
+            return entry
+
+        with self.lock:
+            yearlock = self.yearlocks.setdefault(year, threading.Lock())
+        with yearlock:
+            entry = self.images.get(year)
+            if entry is not None and entry[0] == stamp:
+                return entry
+            gsd = GrowattServerData(year, download=False)
+            image = YearHeatmap(gsd, Projection()).create_image_pil()
+            data = io.BytesIO()
+            image.save(data, format="PNG")
+            etag = '"{}"'.format(hashlib.md5("{}:{}".format(year, stamp).encode("utf-8")).hexdigest())
+            mtime = picklefilename(year).stat().st_mtime if picklefilename(year).exists() else time.time()
+            entry = (stamp, data.getvalue(), etag, email.utils.formatdate(mtime, usegmt=True))
+            self.images[year] = entry
+            return entry
+
+
+class HeatmapRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serves /year/YYYY.png and /live.png (this year) from the ImageCache of the server, GET and HEAD.
+    Answers 304 Not Modified to If-None-Match / If-Modified-Since of an image unchanged.
+    """
+
+    protocol_version = "HTTP/1.1"  # keep-alive for polling dashboards
+    disable_nagle_algorithm = True  # headers and image are written separately
+    yearpath = re.compile(r"^/year/(\d{4})\.png$")
+
+    def do_GET(self):
+        self.send_image(body=True)
+
+    def do_HEAD(self):
+        self.send_image(body=False)
+
+    def send_image(self, body):
+        path = self.path.split("?")[0]
+        match = self.yearpath.match(path)
+        if match:
+            year = int(match.group(1))
+        elif path == "/live.png":
+            year = dt.datetime.now().year
+        else:
+            self.send_error(404)
+            return
+        if year != dt.datetime.now().year and not picklefilename(year).exists():
+            self.send_error(404, "No data for {}".format(year))
+            return
+
+        try:
+            stamp, png, etag, lastmodified = self.server.imagecache.get(year)
+        except Exception as e:
+            self.log_error("rendering %s failed: %r", year, e)
+            self.send_error(500, "Rendering {} failed".format(year))
+            return
+
+        if self.not_modified(etag, lastmodified):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", lastmodified)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(png)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", lastmodified)
+        self.send_header("Cache-Control", "no-cache")  # revalidate, cheap with 304
+        self.end_headers()
+        if body:
+            self.wfile.write(png)
+
+    def not_modified(self, etag, lastmodified):
+        if "If-None-Match" in self.headers:
+            return etag in [tag.strip() for tag in self.headers["If-None-Match"].split(",")] or (
+                self.headers["If-None-Match"].strip() == "*"
+            )
+        if "If-Modified-Since" in self.headers:
+            try:
+                since = email.utils.parsedate_to_datetime(self.headers["If-Modified-Since"])
+            except (TypeError, ValueError):
+                return False
+            return email.utils.parsedate_to_datetime(lastmodified) <= since
+        return False
+
+    def log_message(self, format, *args):
+        if debug:
+            super().log_message(format, *args)
+
+
+def serve(host="", port=8080):
+    """
+    Serve the heatmaps over http, one thread per client.
+    The data are read from the local datafiles; run the collector for fresh data.
+    """
+    server = http.server.ThreadingHTTPServer((host, port), HeatmapRequestHandler)
+    server.imagecache = ImageCache()
+    print("Serving on http://{}:{}/live.png".format(host or "localhost", server.server_address[1]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+
+def benchmark(url, clients=8, requests_per_client=200):
+    """
+    Local load generator: each client thread requests url over one keep-alive connection,
+    first without and then with If-None-Match. Prints requests per second and latencies.
+    """
+    parts = urllib.parse.urlparse(url)
+
+    def client(conditional, results):
+        connection = http.client.HTTPConnection(parts.hostname, parts.port or 80)
+        headers = {}
+        if conditional:
+            connection.request("GET", parts.path)
+            response = connection.getresponse()
+            response.read()
+            headers["If-None-Match"] = response.getheader("ETag", "")
+        for i in range(requests_per_client):
+            start = time.perf_counter()
+            connection.request("GET", parts.path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            results.append((response.status, time.perf_counter() - start))
+        connection.close()
+
+    for conditional in (False, True):
+        results = []
+        threads = [threading.Thread(target=client, args=(conditional, results)) for i in range(clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        latencies = sorted(latency for status, latency in results)
+        statuses = {}
+        for status, latency in results:
+            statuses[status] = statuses.get(status, 0) + 1
+        print(
+            "{:12} {:6} requests {:8.0f} req/s  p50 {:6.1f} ms  p95 {:6.1f} ms  status {}".format(
+                "conditional" if conditional else "full",
+                len(results),
+                len(results) / elapsed,
+                1000 * latencies[len(latencies) // 2],
+                1000 * latencies[int(len(latencies) * 0.95)],
+                statuses,
+            )
+        )
+
+
+"""
+Scan for outages and anomalies, on arrays of days x 5 minute slots (numpy)
+"""
+
+slots_per_day = 24 * 12
+
+
+def power_array(years):
+    """
+    Return the dates of all days of years, from the first day with samples until yesterday
+    (today is not finished), a days x slots array of the power (nan if no sample) and an
+    array with the number of samples per day.
+    The years are loaded one at a time.
+    """
+    import numpy as np
+
+    today = dt.datetime.now().strftime("%Y-%m-%d")
+    dates = [
+        d.strftime("%Y-%m-%d")
+        for year in sorted(years)
+        for d in daterange(dt.datetime(year, 1, 1), dt.datetime(year, 12, 31))
+        if d.strftime("%Y-%m-%d") < today
+    ]
+    index = {datestr: i for i, datestr in enumerate(dates)}
+    power = np.full((len(dates), slots_per_day), np.nan)
+    for year in sorted(years):
+        gsd = GrowattServerData(year, download=False)
+        rows, slots, values = [], [], []
+        for datestr, day in gsd.days.items():
+            if datestr in index:
+                for ts, value in day.samples.items():
+                    rows.append(index[datestr])
+                    slots.append(int(isotime_to_m(ts)) // 5)
+                    values.append(value)
+        power[np.array(rows, dtype=int), np.array(slots, dtype=int)] = values
+    samples = np.sum(~np.isnan(power), axis=1)
+    if not samples.any():
+        return [], power[:0], samples[:0]
+    first = int(np.argmax(samples > 0))  # days before the plant delivered data are no outage
+    return dates[first:], power[first:], samples[first:]
+
+
+def scan_anomalies(years, window=7, flatline_slots=12, truncated_slots=24, low_ratio=0.1):
+    """
+    Find per day:
+    - missing: no samples at all
+    - flatline: the same non-zero power during flatline_slots consecutive slots
+    - truncated: the last sample more than truncated_slots before the median of the neighbouring days
+    - low: energy below low_ratio times the clear-sky envelope, the per slot maximum of the
+      days within window days
+    Returns {datestr: (kind, detail)}, one kind per day in the order above.
+    """
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    dates, power, samples = power_array(years)
+    if not dates:
+        return {}
+    present = samples > 0
+
+    """ flatline: runs of equal non-zero values """
+    equal = (power[:, 1:] == power[:, :-1]) & (power[:, 1:] > 0)
+    flatline = sliding_window_view(equal, flatline_slots - 1, axis=1).all(axis=2).any(axis=1)
+
+    """ truncated: last slot with a sample compared with the neighbours """
+    lastslot = np.where(present, slots_per_day - 1 - np.argmax(~np.isnan(power[:, ::-1]), axis=1), np.nan)
+    padded = np.pad(lastslot, window, constant_values=np.nan)
+    with warnings.catch_warnings(), np.errstate(invalid="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)  # windows of days without samples
+        neighbourslast = np.nanmedian(sliding_window_view(padded, 2 * window + 1), axis=1)
+        truncated = lastslot < neighbourslast - truncated_slots
+
+        """ low: energy compared with the clear-sky envelope """
+        padded = np.pad(power, ((window, window), (0, 0)), constant_values=np.nan)
+        envelope = np.nanmax(sliding_window_view(padded, 2 * window + 1, axis=0), axis=2)
+        energy = np.nansum(power, axis=1) * (5.0 / 60) / 1000  # kWh
+        envelope_energy = np.nansum(envelope, axis=1) * (5.0 / 60) / 1000
+        low = present & (energy < low_ratio * envelope_energy)
+
+    result = {}
+    for i in np.flatnonzero(~present):
+        result[dates[i]] = ("missing", "no samples")
+    for i in np.flatnonzero(present & flatline):
+        result[dates[i]] = ("flatline", "{} slots with equal power".format(flatline_slots))
+    for i in np.flatnonzero(present & ~flatline & truncated):
+        result[dates[i]] = (
+            "truncated",
+            "last sample {}, neighbours {}".format(slot_to_time(lastslot[i]), slot_to_time(neighbourslast[i])),
+        )
+    for i in np.flatnonzero(present & ~flatline & ~truncated & low):
+        result[dates[i]] = ("low", "{:.1f} kWh, clear sky {:.1f} kWh".format(energy[i], envelope_energy[i]))
+    return dict(sorted(result.items()))
+
+
+def slot_to_time(slot):
+    slot = int(slot)
+    return "{:02}:{:02}".format(slot // 12, 5 * (slot % 12))
+
+
+def anomaly_report(years, anomalies):
+    """
+    Machine readable report: the days, and periods of consecutive days of the same kind
+    """
+    periods = []
+    for datestr, (kind, detail) in anomalies.items():
+        if periods and periods[-1]["kind"] == kind and isodate_diff(datestr, periods[-1]["last"]) == 1:
+            periods[-1]["last"] = datestr
+            periods[-1]["days"] += 1
+        else:
+            periods.append({"kind": kind, "first": datestr, "last": datestr, "days": 1})
+    summary = {}
+    for kind, detail in anomalies.values():
+        summary[kind] = summary.get(kind, 0) + 1
+    return {
+        "generated": dt.datetime.now().isoformat(timespec="seconds"),
+        "years": sorted(years),
+        "summary": summary,
+        "periods": periods,
+        "days": [{"date": datestr, "kind": kind, "detail": detail} for datestr, (kind, detail) in anomalies.items()],
+    }
+
+
+def scan(years, reportfilename=None, overlaydir=None):
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        sys.exit("numpy is needed to scan for anomalies")
+    anomalies = scan_anomalies(years)
+    report = anomaly_report(years, anomalies)
+    if reportfilename is None:
+        print(json.dumps(report["periods"], indent=1))
+    else:
+        with open(reportfilename, "w") as f:
+            json.dump(report, f, indent=1)
+    if overlaydir is not None:
+        overlaydir = Path(overlaydir)
+        overlaydir.mkdir(parents=True, exist_ok=True)
+        kinds = {datestr: kind for datestr, (kind, detail) in anomalies.items()}
+        for year in sorted(years):
+            gsd = GrowattServerData(year, download=False)
+            image = YearHeatmap(gsd, Projection(), anomalies=kinds).create_image_pil()
+            image.save(overlaydir / "solarview_anomalies_{}.png".format(year))
+    return report
+
+
+"""
+argparse type for a date YYYY-MM-DD
+"""
+
+
+def isodate(value):
+    try:
+        return dt.datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError("{} is not a date YYYY-MM-DD".format(value))
+
+
+"""
+argparse type for counts of at least 1
+"""
+
+
+def positive_int(value):
+    result = int(value)
+    if result < 1:
+        raise argparse.ArgumentTypeError("{} is not at least 1".format(value))
+    return result
+
+
+"""
+parse a range of years: "2019", "2018-2020" or "2018-" (until this year)
+"""
+
+
+def parse_years(yearsstr):
+    first, separator, last = yearsstr.partition("-")
+    first = int(first)
+    if not separator:
+        last = first
+    elif last == "":
+        last = dt.datetime.now().year
+    else:
+        last = int(last)
+    return list(range(first, last + 1))
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Solarview - Growatt server annual overview")
+    parser.add_argument("--viewer", action="store_true", help="gui only reads the local data, written by collect")
+    parser.add_argument("--profile", metavar="TRACEFILE", help="write the duration of each phase to a json trace")
+    parser.add_argument("--cprofile", action="store_true", help="with --profile, also write a .prof-file per phase")
+
+    """ --profile and --cprofile are accepted after the command as well """
+    profiling = argparse.ArgumentParser(add_help=False)
+    profiling.add_argument("--profile", metavar="TRACEFILE", default=argparse.SUPPRESS, help="as before the command")
+    profiling.add_argument("--cprofile", action="store_true", default=argparse.SUPPRESS, help="as before the command")
+    subparsers = parser.add_subparsers(dest="command")
+
+    poster = subparsers.add_parser(
+        "poster", help="render several years into one png-file, from local data only", parents=[profiling]
+    )
+    poster.add_argument("filename", help="png-file to write")
+    poster.add_argument("--years", help="e.g. 2018-2020 or 2018- (default: all years available locally)")
+    poster.add_argument("--columns", type=positive_int, help="years per strip (default: all years on one strip)")
+
+    printer = subparsers.add_parser(
+        "print", help="render a year at high resolution, from local data only", parents=[profiling]
+    )
+    printer.add_argument("year", type=int)
+    printer.add_argument("filename", help="png-file to write")
+    size = printer.add_mutually_exclusive_group()
+    size.add_argument("--scale", type=float, default=4.0, help="scale factor (default: 4)")
+    size.add_argument("--dpi", type=float, help="resolution, relative to a 96 dpi screen")
+
+    exporter = subparsers.add_parser(
+        "export", help="export the stored data to csv, parquet or arrow", parents=[profiling]
+    )
+    exporter.add_argument("filename", help="file to write, the format follows from the suffix")
+    exporter.add_argument("--table", choices=sorted(export_tables), default="samples")
+    exporter.add_argument("--format", dest="fileformat", choices=("csv", "parquet", "arrow"))
+    exporter.add_argument("--start", type=isodate, help="first day, YYYY-MM-DD")
+    exporter.add_argument("--end", type=isodate, help="last day, YYYY-MM-DD")
+    exporter.add_argument("--plant", help="plant id or name")
+    exporter.add_argument("--chunksize", type=positive_int, default=10000, help="rows per chunk (default: 10000)")
+
+    importer = subparsers.add_parser(
+        "import", help="import history exported from the Growatt web portal", parents=[profiling]
+    )
+    importer.add_argument("filenames", nargs="+", help="csv- or xlsx-files")
+    importer.add_argument("--time-column", help="name of the time column (default: first column named time/date)")
+    importer.add_argument("--power-column", help="name of the power column (default: first column named pac/ppv)")
+    importer.add_argument("--delimiter", help="delimiter of the csv-files (default: detected)")
+    importer.add_argument("--tolerance", type=float, default=0.1, help="allowed deviation of the day energy")
+    importer.add_argument("--no-validate", action="store_true", help="do not compare with the month data")
+    importer.add_argument("--no-download", action="store_true", help="do not download the days not covered")
+    importer.add_argument("--overwrite", action="store_true", help="replace days already stored")
+
+    collector = subparsers.add_parser(
+        "collect", help="download new data on a schedule, without gui", parents=[profiling]
+    )
+    collector.add_argument("--interval", type=int, default=15, help="minutes between downloads (default: 15)")
+    collector.add_argument("--once", action="store_true", help="download once and stop")
+
+    server = subparsers.add_parser(
+        "serve", help="serve the heatmaps over http, from local data only", parents=[profiling]
+    )
+    server.add_argument("--host", default="", help="address to listen on (default: all)")
+    server.add_argument("--port", type=int, default=8080)
+
+    bench = subparsers.add_parser("bench", help="measure the throughput of a running server", parents=[profiling])
+    bench.add_argument("url", nargs="?", default="http://localhost:8080/live.png")
+    bench.add_argument("--clients", type=int, default=8)
+    bench.add_argument("--requests", type=int, default=200, help="requests per client")
+
+    scanner = subparsers.add_parser(
+        "scan", help="find outages and anomalies in the local data (needs numpy)", parents=[profiling]
+    )
+    scanner.add_argument("--years", help="e.g. 2018-2020 or 2018- (default: all years available locally)")
+    scanner.add_argument("--report", help="json-file to write (default: print the periods)")
+    scanner.add_argument("--overlay", help="directory to write the heatmaps with the anomalies marked")
+
+    args = parser.parse_args()
+
+    if args.profile:
+        profiler.start(args.profile, cprofile=args.cprofile)
+    try:
+        run(args)
+    finally:
+        profiler.write()
+
+
+def run(args):
+    if args.command is None:
+        mainwindow = tk.Tk()
+        with profiler.phase("startup"):
+            SolarviewApp(mainwindow, viewer=args.viewer)
+        mainwindow.mainloop()
+        return
+
+    readinifile()
+
+    if args.command == "poster":
+        if args.years:
+            years = parse_years(args.years)
+        else:
+            years = GrowattServerData.yearsavailablelocally()
+        missing = [year for year in years if not picklefilename(year).exists()]
+        if missing:
+            print("No local data, skipped: {}".format(" ".join(str(year) for year in missing)), file=sys.stderr)
+        years = [year for year in years if year not in missing]
+        if not years:
+            sys.exit("No years to render")
+        render_poster(years, args.filename, columns=args.columns)
+
+    elif args.command == "print":
+        if args.dpi:
+            render_print(args.year, args.filename, args.dpi / 96, dpi=args.dpi)
+        else:
+            render_print(args.year, args.filename, args.scale)
+
+    elif args.command == "export":
+        export(
+            args.filename,
+            table=args.table,
+            fileformat=args.fileformat,
+            start=args.start,
+            end=args.end,
+            plant=args.plant,
+            chunksize=args.chunksize,
+        )
+
+    elif args.command == "import":
+        try:
+            report = import_portal_exports(
+                args.filenames,
+                timecolumn=args.time_column,
+                powercolumn=args.power_column,
+                delimiter=args.delimiter,
+                validate=not args.no_validate,
+                tolerance=args.tolerance,
+                download=not args.no_download,
+                overwrite=args.overwrite,
+            )
+        except ValueError as e:
+            sys.exit(str(e))
+        for key in ("imported", "rejected", "downloaded"):
+            print("{:10} {} days".format(key, len(report[key])))
+        if report["rejected"]:
+            print("rejected:", " ".join(report["rejected"]))
+
+    elif args.command == "collect":
+        collect(interval=args.interval, once=args.once)
+
+    elif args.command == "serve":
+        serve(host=args.host, port=args.port)
+
+    elif args.command == "scan":
+        years = parse_years(args.years) if args.years else GrowattServerData.yearsavailablelocally()
+        scan(years, reportfilename=args.report, overlaydir=args.overlay)
 
-    mainwindow = tk.Tk()
-    SolarviewApp(mainwindow)
-    mainwindow.mainloop()
+    elif args.command == "bench":
+        benchmark(args.url, clients=args.clients, requests_per_client=args.requests)
 
 
 if __name__ == "__main__":